@@ -0,0 +1,274 @@
+import os
+import re
+import pickle
+import argparse
+import unicodedata
+from collections import deque, Counter
+from pathlib import Path
+
+# The automaton is built exactly as in snomed_diz_llm/streamlit/concept_matcher.py
+# so pickles are interchangeable. It is a copy because the defaults differ:
+# this folder resolves output/ and kb_sources/ from the working directory.
+MATCHER_PATH = Path(os.getenv("CONCEPT_MATCHER_PATH", "output/concept_matcher.pkl"))
+MRCONSO_PATH = Path(os.getenv("MRCONSO_PATH", "kb_sources/umls/MRCONSO.RRF"))
+
+# Patterns made only of these tokens are not indexed (UMLS has concepts named "A", "In", "Was")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in", "is", "it",
+    "of", "on", "or", "that", "the", "to", "was", "were", "with", "no", "not",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_matcher = None
+
+
+def normalize_tokens(text: str):
+    """
+    Lowercase, strip accents, split on anything that is not a letter or digit
+    """
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(text.lower())
+
+
+class ConceptMatcher:
+    """
+    Aho-Corasick automaton over normalised concept strings, at token level
+    so matches always start and end on word boundaries. Each pattern maps
+    to one CUI (the first preferred string wins). Scanning a text finds
+    every dictionary string in one pass; overlapping hits are resolved
+    leftmost-longest.
+    """
+
+    def __init__(self):
+        self.vocab = {}
+        self.goto = [{}]
+        self.fail = [0]
+        # (pattern length in tokens, cui) for a pattern ending at the state
+        self.term = [None]
+        # Next state on the fail chain that ends a pattern
+        self.out = [0]
+        self.n_patterns = 0
+
+    # ---------------- build ----------------
+    def add(self, text: str, cui: str) -> bool:
+        tokens = normalize_tokens(text)
+        if not tokens or all(t in STOPWORDS for t in tokens):
+            return False
+        if len(tokens) == 1 and len(tokens[0]) < 2:
+            return False
+
+        state = 0
+        for tok in tokens:
+            tid = self.vocab.setdefault(tok, len(self.vocab))
+            nxt = self.goto[state].get(tid)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][tid] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.term.append(None)
+                self.out.append(0)
+            state = nxt
+
+        if self.term[state] is None:
+            self.term[state] = (len(tokens), cui)
+            self.n_patterns += 1
+        return True
+
+    def compile(self):
+        queue = deque()
+        for nxt in self.goto[0].values():
+            self.fail[nxt] = 0
+            queue.append(nxt)
+
+        while queue:
+            state = queue.popleft()
+            for tid, nxt in self.goto[state].items():
+                f = self.fail[state]
+                while f and tid not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(tid, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                fs = self.fail[nxt]
+                self.out[nxt] = fs if self.term[fs] is not None else self.out[fs]
+                queue.append(nxt)
+        return self
+
+    # ---------------- match ----------------
+    def _hits(self, tokens):
+        """
+        All (start, end, cui) with tokens[start:end] a dictionary string
+        """
+        hits = []
+        state = 0
+        for i, tok in enumerate(tokens):
+            tid = self.vocab.get(tok)
+            if tid is None:
+                state = 0
+                continue
+            while state and tid not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(tid, 0)
+
+            s = state if self.term[state] is not None else self.out[state]
+            while s:
+                length, cui = self.term[s]
+                hits.append((i + 1 - length, i + 1, cui))
+                s = self.out[s]
+        return hits
+
+    def match_tokens(self, tokens):
+        # Leftmost-longest, non-overlapping
+        hits = sorted(self._hits(tokens), key=lambda h: (h[0], -(h[1] - h[0])))
+        out = []
+        end = 0
+        for start, stop, cui in hits:
+            if start >= end:
+                out.append((start, stop, cui))
+                end = stop
+        return out
+
+    def match_text(self, text: str):
+        """
+        [(start_token, end_token, cui), ...] for a chunk or any free text
+        """
+        return self.match_tokens(normalize_tokens(text))
+
+    def match_entity(self, name: str):
+        """
+        (cui, score) for an entity name, or None. An exact dictionary
+        string scores 1.0; otherwise the longest string inside the name
+        scores by the share of the name's tokens it covers.
+        """
+        tokens = normalize_tokens(name)
+        if not tokens:
+            return None
+        best = None
+        for start, stop, cui in self.match_tokens(tokens):
+            if best is None or stop - start > best[1] - best[0]:
+                best = (start, stop, cui)
+        if best is None:
+            return None
+        return best[2], (best[1] - best[0]) / len(tokens)
+
+    def top_concepts(self, text: str, k: int = 6):
+        """
+        [(cui, score), ...] for the k concepts covering most tokens of text
+        """
+        weight = Counter()
+        for start, stop, cui in self.match_text(text):
+            weight[cui] += stop - start
+        return [(cui, float(w)) for cui, w in weight.most_common(k)]
+
+    # ---------------- persistence ----------------
+    def save(self, path: Path = MATCHER_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path = MATCHER_PATH):
+        m = cls.__new__(cls)
+        with open(path, "rb") as f:
+            m.__dict__.update(pickle.load(f))
+        return m
+
+
+# ---------------- Sources ----------------
+def iter_mrconso_strings(path: Path = MRCONSO_PATH):
+    """
+    (cui, string) for English, non-suppressed atoms, preferred atoms of
+    each concept first so they own any string shared between CUIs
+    """
+    preferred, other = [], []
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            cols = line.split("|")
+            if len(cols) < 17 or cols[1] != "ENG" or cols[16] not in ("N", ""):
+                continue
+            cui, term = cols[0], cols[14]
+            if cols[2] == "P" and cols[4] == "PF" and cols[6] == "Y":
+                preferred.append((cui, term))
+            else:
+                other.append((cui, term))
+    yield from preferred
+    yield from other
+
+
+def iter_neo4j_strings(driver):
+    """
+    (cui, string) from Concept.name, then Concept.synonyms
+    """
+    with driver.session() as s:
+        rows = s.run("MATCH (c:Concept) RETURN c.cui AS cui, c.name AS name, c.synonyms AS syn").values()
+    for cui, name, _ in rows:
+        if cui and name:
+            yield cui, name
+    for cui, _, syn in rows:
+        for term in syn or []:
+            if cui and term:
+                yield cui, term
+
+
+def build_matcher(strings, path: Path = MATCHER_PATH) -> ConceptMatcher:
+    m = ConceptMatcher()
+    for cui, term in strings:
+        m.add(term, cui)
+    m.compile()
+    m.save(path)
+    print(f"CONCEPT_MATCHER: {m.n_patterns} strings, {len(m.goto)} states -> {path}")
+    return m
+
+
+def get_matcher():
+    """
+    Shared matcher loaded from MATCHER_PATH, or None if it was never built
+    """
+    global _matcher
+    if _matcher is None:
+        if not MATCHER_PATH.exists():
+            return None
+        _matcher = ConceptMatcher.load(MATCHER_PATH)
+    return _matcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dictionary matcher for UMLS concept linking")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Compile the matcher from MRCONSO or the Concept nodes")
+    b.add_argument("--source", choices=["mrconso", "neo4j"], default="mrconso")
+    b.add_argument("--mrconso", type=str, default=str(MRCONSO_PATH))
+    b.add_argument("--out", type=str, default=str(MATCHER_PATH))
+
+    q = sub.add_parser("match", help="Print concepts found in a text")
+    q.add_argument("text")
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        if args.source == "mrconso":
+            build_matcher(iter_mrconso_strings(Path(args.mrconso)), Path(args.out))
+        else:
+            from utils import get_driver
+            driver = get_driver()
+            try:
+                build_matcher(iter_neo4j_strings(driver), Path(args.out))
+            finally:
+                driver.close()
+    else:
+        m = get_matcher()
+        if m is None:
+            raise RuntimeError(f"No matcher at {MATCHER_PATH}, run: python concept_matcher.py build")
+        tokens = normalize_tokens(args.text)
+        for start, stop, cui in m.match_tokens(tokens):
+            print(f"{cui}\t{' '.join(tokens[start:stop])}")
+
+
+if __name__ == "__main__":
+    main()
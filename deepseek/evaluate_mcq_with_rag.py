@@ -5,6 +5,7 @@ import pandas as pd
 from datetime import datetime
 
 from llm_df import test_llm_connection
+from response_cache import get_response_cache
 from rag_faiss import retrieve_with_faiss, build_faiss_index
 from rag_graph import retrieve_with_graph
 from rag_hybrid import retrieve_with_hybrid
@@ -57,6 +58,10 @@ def main():
         acc = round(100 * sum(flags) / len(flags), 2)
         print(name, acc)
 
+    cache = get_response_cache()
+    if cache is not None:
+        print(cache.stats_line())
+
 
 if __name__ == "__main__":
     main()
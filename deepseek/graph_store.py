@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+SQLITE_PATH = os.getenv("GRAPH_SQLITE_PATH", "output/graph.sqlite")
+
+# Same tables as snomed_diz_llm/streamlit/graph_store.py, so either exporter
+# produces a file this module can read.
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS mentions (chunk_id TEXT NOT NULL, entity TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS neighbour (head TEXT NOT NULL, type TEXT NOT NULL, tail TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS mentions_chunk ON mentions(chunk_id);
+CREATE INDEX IF NOT EXISTS neighbour_head ON neighbour(head);
+"""
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# ---------------- Interface ----------------
+class GraphStore(ABC):
+    """
+    Only the chunk neighbourhood lookup that rag_graph needs. The store in
+    snomed_diz_llm/streamlit also answers Entity and SNOMED queries; this
+    graph links chunks straight to UMLS Concept nodes and has neither, and
+    the snapshot imports only its own modules, so it keeps this subset.
+    """
+
+    @abstractmethod
+    def chunk_edges(self, chunk_ids: List[str], limit: int = 40) -> List[Tuple[str, str, str]]:
+        """(head, rel_type, tail) for every edge leaving a node the chunks mention"""
+        ...
+
+
+# ---------------- Neo4j ----------------
+class Neo4jGraphStore(GraphStore):
+    def __init__(self, driver=None):
+        # Imported here so the SQLite backend works without the neo4j package
+        from utils import get_driver
+        self.driver = driver or get_driver()
+
+    def chunk_edges(self, chunk_ids, limit=40):
+        from utils import neo4j_rows
+        rows = neo4j_rows(
+            self.driver,
+            """
+            UNWIND $ids AS cid
+            MATCH (c:Chunk {id:cid})-[:MENTIONS]->(x)-[r]->(y)
+            RETURN coalesce(x.name,x.cui) AS h, type(r) AS rel, coalesce(y.name,y.cui) AS t
+            LIMIT $limit
+            """,
+            {"ids": list(chunk_ids), "limit": int(limit)},
+        )
+        return [(r["h"], r["rel"], r["t"]) for r in rows]
+
+
+# ---------------- SQLite ----------------
+class SQLiteGraphStore(GraphStore):
+    def __init__(self, path: str = SQLITE_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Graph SQLite file not found: {path} (run graph_store.py export)")
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def chunk_edges(self, chunk_ids, limit=40):
+        ids = list(chunk_ids)
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            return self.conn.execute(
+                f"""
+                SELECT mn.entity, n.type, n.tail
+                FROM mentions mn JOIN neighbour n ON n.head = mn.entity
+                WHERE mn.chunk_id IN ({marks})
+                LIMIT ?
+                """,
+                (*ids, int(limit)),
+            ).fetchall()
+
+
+def get_graph_store() -> GraphStore:
+    """GRAPH_BACKEND=neo4j (default) or sqlite"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.getenv("GRAPH_BACKEND", "neo4j").lower()
+            if backend == "sqlite":
+                _store = SQLiteGraphStore(SQLITE_PATH)
+            elif backend == "neo4j":
+                _store = Neo4jGraphStore()
+            else:
+                raise RuntimeError(f"Unknown GRAPH_BACKEND: {backend} (use neo4j or sqlite)")
+    return _store
+
+
+# ---------------- Neo4j -> SQLite ----------------
+EXPORT_QUERIES = {
+    "mentions": (
+        "MATCH (c:Chunk)-[:MENTIONS]->(x) RETURN DISTINCT c.id, coalesce(x.name, x.cui)",
+        2,
+    ),
+    "neighbour": (
+        """
+        MATCH (:Chunk)-[:MENTIONS]->(x)-[r]->(y)
+        RETURN DISTINCT coalesce(x.name, x.cui), type(r), coalesce(y.name, y.cui)
+        """,
+        3,
+    ),
+}
+
+
+def export_to_sqlite(driver, path: str = SQLITE_PATH, batch_size: int = 5000):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    conn = sqlite3.connect(tmp)
+    conn.executescript(SQLITE_SCHEMA)
+    with driver.session() as s:
+        for table, (cypher, n_cols) in EXPORT_QUERIES.items():
+            insert = f"INSERT INTO {table} VALUES ({','.join('?' * n_cols)})"
+            n = 0
+            batch = []
+            for rec in s.run(cypher):
+                batch.append(tuple(rec.values()))
+                if len(batch) >= batch_size:
+                    conn.executemany(insert, batch)
+                    n += len(batch)
+                    batch = []
+            conn.executemany(insert, batch)
+            n += len(batch)
+            conn.commit()
+            print(f"[GRAPH_EXPORT] {table}: {n} rows")
+    conn.close()
+    os.replace(tmp, path)
+    print(f"[GRAPH_EXPORT] done -> {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy the chunk neighbourhood graph from Neo4j into SQLite")
+    parser.add_argument("--out", type=str, default=SQLITE_PATH)
+    args = parser.parse_args()
+
+    from utils import get_driver
+    export_to_sqlite(get_driver(), args.out)
@@ -1,9 +1,14 @@
 import os
 import re
+import json
+import math
 import time
-import requests
+from typing import Optional
 from dotenv import load_dotenv
 
+from http_client import get_client
+from response_cache import get_response_cache, response_key
+
 load_dotenv(".env")
 
 API_BASE = os.getenv("SAIA_API_BASE").rstrip("/")
@@ -12,7 +17,98 @@ MODEL = os.getenv("SAIA_MODEL")
 
 _FINAL_RE = re.compile(r"FINAL\s+ANSWER\s*:\s*([ABCD])", re.I)
 
-def chat_mcq(prompt: str) -> str:
+# MCQ answers from one 1-token call with the A-D token distribution (falls
+# back to the FINAL ANSWER generation when the server returns no logprobs)
+MCQ_LOGPROBS = os.getenv("MCQ_LOGPROBS", "1") != "0"
+MCQ_TOP_LOGPROBS = int(os.getenv("MCQ_TOP_LOGPROBS", "10"))
+# The prompts ask for "Final answer: X"; the 1-token call needs the letter first
+LETTER_ONLY = "\nReply with the letter only."
+
+# Set to False once the endpoint rejects or ignores logprobs
+_logprobs_supported = None
+
+
+def _post(payload: dict) -> dict:
+    return get_client().post_json(
+        f"{API_BASE}/chat/completions",
+        payload,
+        headers={
+            "Authorization": f"Bearer {API_KEY}",
+            "Content-Type": "application/json",
+        },
+    )
+
+
+def _letter_probs(choice: dict) -> dict:
+    """
+    Normalised probabilities of A-D for the first generated token
+    """
+    content = (choice.get("logprobs") or {}).get("content") or []
+    if not content:
+        return {}
+    top = content[0].get("top_logprobs") or [content[0]]
+    probs = {}
+    for t in top:
+        tok = (t.get("token") or "").strip().strip("().:").upper()
+        if tok in ("A", "B", "C", "D") and t.get("logprob") is not None:
+            probs[tok] = probs.get(tok, 0.0) + math.exp(t["logprob"])
+    total = sum(probs.values())
+    return {k: v / total for k, v in probs.items()} if total else {}
+
+
+def _mcq_logprobs(prompt: str, use_cache: bool) -> Optional[dict]:
+    global _logprobs_supported
+    payload = {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt + LETTER_ONLY}],
+        "temperature": 0.0,
+        "max_tokens": 1,
+        "logprobs": True,
+        "top_logprobs": MCQ_TOP_LOGPROBS,
+    }
+
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        key = response_key(f"{API_BASE}/chat/completions", payload)
+        hit = cache.get(key)
+        if hit is not None:
+            return json.loads(hit)
+
+    # 400/422 mean no logprobs support; 429, 5xx and timeouts are retried
+    # like the FINAL ANSWER calls before falling back to them
+    out = None
+    for _ in range(4):
+        try:
+            out = _post(payload)
+            break
+        except Exception as exc:
+            status = getattr(getattr(exc, "response", None), "status_code", None)
+            if status in (400, 422):
+                _logprobs_supported = False
+                print("MCQ: endpoint rejects logprobs, using FINAL ANSWER generation")
+                return None
+            time.sleep(1)
+    if out is None:
+        return None
+
+    choice = out["choices"][0]
+    if choice.get("logprobs") is None:
+        _logprobs_supported = False
+        print("MCQ: endpoint returns no logprobs, using FINAL ANSWER generation")
+        return None
+    _logprobs_supported = True
+
+    probs = _letter_probs(choice)
+    if not probs:
+        return None
+    letter = max(probs, key=probs.get)
+    ans = {"letter": letter, "probs": probs, "confidence": probs[letter], "mode": "logprobs"}
+    if cache is not None:
+        cache.put(key, MODEL, json.dumps(ans))
+    return ans
+
+
+def _generate_mcq(prompt: str, use_cache: bool = True) -> str:
     payload = {
         "model": MODEL,
         "messages": [{"role": "user", "content": prompt}],
@@ -20,21 +116,22 @@ def chat_mcq(prompt: str) -> str:
         "max_tokens": 40,
     }
 
+    # Only answers with a parsable letter are cached
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        key = response_key(f"{API_BASE}/chat/completions", payload)
+        m = _FINAL_RE.search((cache.get(key) or "").upper())
+        if m:
+            return m.group(1)
+
     for _ in range(4):
         try:
-            r = requests.post(
-                f"{API_BASE}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json=payload,
-                timeout=180,
-            )
-            r.raise_for_status()
-            txt = r.json()["choices"][0]["message"]["content"]
+            out = _post(payload)
+            txt = out["choices"][0]["message"]["content"]
             m = _FINAL_RE.search(txt.upper())
             if m:
+                if cache is not None:
+                    cache.put(key, MODEL, txt)
                 return m.group(1)
         except Exception:
             time.sleep(1)
@@ -42,5 +139,21 @@ def chat_mcq(prompt: str) -> str:
     return "A"
 
 
+def answer_mcq(prompt: str, use_cache: bool = True) -> dict:
+    """
+    {"letter", "probs", "confidence", "mode"}; probs/confidence are only
+    set when the answer came from logprobs
+    """
+    if MCQ_LOGPROBS and _logprobs_supported is not False:
+        ans = _mcq_logprobs(prompt, use_cache)
+        if ans is not None:
+            return ans
+    return {"letter": _generate_mcq(prompt, use_cache), "probs": {}, "confidence": None, "mode": "text"}
+
+
+def chat_mcq(prompt: str, use_cache: bool = True) -> str:
+    return answer_mcq(prompt, use_cache)["letter"]
+
+
 def test_llm_connection():
-    return chat_mcq("Final answer: A") == "A"
+    return _generate_mcq("Final answer: A", use_cache=False) == "A"
@@ -1,4 +1,5 @@
-from utils import get_driver, neo4j_rows, normalize_ws
+from utils import normalize_ws
+from graph_store import get_graph_store
 from rag_faiss import load_index
 from llm_df import chat_mcq
 
@@ -8,19 +9,9 @@ def retrieve_with_graph(question, opts):
     docs = db.as_retriever(search_kwargs={"k": 6}).invoke(question)
     chunk_ids = [d.metadata.get("chunk_id") for d in docs if d.metadata.get("chunk_id")][:5]
 
-    driver = get_driver()
-    rows = neo4j_rows(
-        driver,
-        """
-        UNWIND $ids AS cid
-        MATCH (c:Chunk {id:cid})-[:MENTIONS]->(x)-[r]->(y)
-        RETURN coalesce(x.name,x.cui) AS h, type(r) AS rel, coalesce(y.name,y.cui) AS t
-        LIMIT 40
-        """,
-        {"ids": chunk_ids},
-    )
-
-    graph = "\n".join(f"{normalize_ws(r['h'])} --{r['rel']}--> {normalize_ws(r['t'])}" for r in rows)
+    edges = get_graph_store().chunk_edges(chunk_ids, limit=40)
+
+    graph = "\n".join(f"{normalize_ws(h)} --{rel}--> {normalize_ws(t)}" for h, rel, t in edges)
 
     prompt = f"""
 Use ONLY the GRAPH.
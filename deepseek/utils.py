@@ -6,6 +6,8 @@ from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable, SessionExpired, Neo4jError
 from dotenv import load_dotenv
 
+from concept_matcher import get_matcher
+
 load_dotenv(".env")
 
 _DRIVER = None
@@ -86,16 +88,21 @@ def upsert_chunks_and_link_concepts(
     chunks: List[str],
     top_k_concepts: int = 6,
 ):
-    neo4j_rows(
-        driver,
-        """
-        CALL db.index.fulltext.createNodeIndex(
-          'conceptNameFulltext',
-          ['Concept'],
-          ['name']
+    # In-process dictionary matches when a compiled matcher exists
+    # (concept_matcher.py build), Lucene fulltext otherwise
+    matcher = None if os.getenv("CONCEPT_LINKER", "auto").lower() == "fulltext" else get_matcher()
+
+    if matcher is None:
+        neo4j_rows(
+            driver,
+            """
+            CALL db.index.fulltext.createNodeIndex(
+              'conceptNameFulltext',
+              ['Concept'],
+              ['name']
+            )
+            """
         )
-        """
-    )
 
     for idx, chunk in enumerate(chunks):
         cid = f"{source}::{idx}"
@@ -109,21 +116,25 @@ def upsert_chunks_and_link_concepts(
             {"id": cid, "text": chunk[:3000], "src": source},
         )
 
-        q = lucene_safe_query(chunk)
-        if not q:
-            continue
+        if matcher is not None:
+            hits = matcher.top_concepts(chunk, k=int(top_k_concepts))
+            rows = [{"cui": cui, "score": score} for cui, score in hits]
+        else:
+            q = lucene_safe_query(chunk)
+            if not q:
+                continue
 
-        rows = neo4j_rows(
-            driver,
-            """
-            CALL db.index.fulltext.queryNodes('conceptNameFulltext', $q)
-            YIELD node, score
-            RETURN node.cui AS cui, score
-            ORDER BY score DESC
-            LIMIT $k
-            """,
-            {"q": q, "k": int(top_k_concepts)},
-        )
+            rows = neo4j_rows(
+                driver,
+                """
+                CALL db.index.fulltext.queryNodes('conceptNameFulltext', $q)
+                YIELD node, score
+                RETURN node.cui AS cui, score
+                ORDER BY score DESC
+                LIMIT $k
+                """,
+                {"q": q, "k": int(top_k_concepts)},
+            )
 
         for r in rows:
             neo4j_rows(
@@ -1,11 +1,17 @@
 import os
+import argparse
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
 
 from import_umls_concepts import import_umls_concepts
-from import_umls_relations import import_umls_relations
+from import_umls_relations import import_umls_relations, DEFAULT_WORKERS
 from import_semantic_types import import_semantic_types
 from import_snomed_tc import import_snomed_tc
+from kg_batch import DEFAULT_BATCH_SIZE
+from export_admin_csv import export_all
+from kg_checkpoint import print_status, reset_checkpoints
+from kg_filters import SourceFilter, FILTERS_FILE
+from kg_metrics import REPORT_DIR, write_run_report
 
 # .env is in project_root
 load_dotenv()
@@ -48,30 +54,81 @@ def ensure_constraints_and_indexes(driver):
         """)
 
         # ---------- FULLTEXT INDEX ----------
-        # Used for robust Entity -> UMLS Concept mapping
+        # Used for robust Entity -> UMLS Concept mapping.
+        # synonyms is the per-CUI list written by import_umls_concepts.
+        # Named conceptNameFulltext, the name the streamlit linking code
+        # queries; databases built with the old conceptNameFT are migrated.
+        s.run("DROP INDEX conceptNameFT IF EXISTS")
         s.run("""
-        CREATE FULLTEXT INDEX conceptNameFT IF NOT EXISTS
-        FOR (c:Concept) ON EACH [c.name]
+        CREATE FULLTEXT INDEX conceptNameFulltext IF NOT EXISTS
+        FOR (c:Concept) ON EACH [c.name, c.synonyms]
         """)
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows per UNWIND transaction (env KG_BATCH_SIZE)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Parallel sessions for the MRREL import (env KG_REL_WORKERS)")
+    parser.add_argument("--offline-export", metavar="OUT_DIR", default=None,
+                        help="Write neo4j-admin import CSVs instead of loading over Bolt")
+    parser.add_argument("--filters", default=FILTERS_FILE,
+                        help="JSON filter config for MRCONSO/MRREL rows (env KG_FILTERS)")
+    parser.add_argument("--snomed-direct", action="store_true",
+                        default=os.getenv("SNOMED_DIRECT_ISA", "0") == "1",
+                        help="Store only direct SNOMED is-a edges instead of the transitive closure")
+    parser.add_argument("--report-dir", default=REPORT_DIR,
+                        help="Where the per-stage JSON/CSV run report is written (env KG_REPORT_DIR)")
+    parser.add_argument("--status", action="store_true",
+                        help="Show checkpointed import progress per source and exit")
+    parser.add_argument("--restart", action="store_true",
+                        help="Discard checkpoints and import every source from the start")
+    parser.add_argument("--schema-only", action="store_true",
+                        help="Only create constraints and indexes (e.g. after neo4j-admin import)")
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+        return
+
+    if args.restart:
+        reset_checkpoints()
+
+    filters = SourceFilter.from_file(args.filters)
+
+    if args.offline_export:
+        print(f"BUILD_BIG_KG: exporting neo4j-admin CSVs to {args.offline_export}...")
+        export_all(args.offline_export, filters, snomed_direct=args.snomed_direct)
+        return
+
     driver = get_driver()
     ensure_constraints_and_indexes(driver)
-
-    print("BUILD_BIG_KG: importing UMLS concepts...")
-    import_umls_concepts(driver)
-
-    print("BUILD_BIG_KG: importing UMLS relations...")
-    import_umls_relations(driver)
-
-    print("BUILD_BIG_KG: importing semantic types...")
-    import_semantic_types(driver)
-
-    print("BUILD_BIG_KG: importing SNOMED transitive closure...")
-    import_snomed_tc(driver)
-
-    print("BUILD_BIG_KG: done.")
-    driver.close()
+    if args.schema_only:
+        print("BUILD_BIG_KG: schema created.")
+        driver.close()
+        return
+
+    try:
+        print(f"BUILD_BIG_KG: importing UMLS concepts (batch_size={args.batch_size})...")
+        import_umls_concepts(driver, batch_size=args.batch_size, filters=filters)
+
+        print(f"BUILD_BIG_KG: importing UMLS relations (workers={args.workers})...")
+        import_umls_relations(driver, batch_size=args.batch_size, workers=args.workers, filters=filters)
+
+        print("BUILD_BIG_KG: importing semantic types...")
+        import_semantic_types(driver, batch_size=args.batch_size)
+
+        if args.snomed_direct:
+            print("BUILD_BIG_KG: importing direct SNOMED is-a edges...")
+        else:
+            print("BUILD_BIG_KG: importing SNOMED transitive closure...")
+        import_snomed_tc(driver, batch_size=args.batch_size, direct_only=args.snomed_direct)
+
+        print("BUILD_BIG_KG: done.")
+    finally:
+        # Also written when a stage fails, so a partial run can be diagnosed
+        write_run_report(args.report_dir)
+        driver.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,174 @@
+import os
+import csv
+import time
+
+from kg_batch import SourceReader
+from kg_filters import SourceFilter
+from import_umls_concepts import UMLS_DIR, iter_concepts
+from import_umls_relations import iter_mrrel_rows
+from import_semantic_types import SEM_DIR, iter_semantic_rows
+from import_snomed_tc import find_tc_file, iter_tc_pairs, build_direct_isa_file, DIRECT_ISA_FILE
+
+# File name -> header, in the order neo4j-admin expects them on the command line
+NODE_FILES = {
+    "nodes_concept.csv": ["cui:ID(Concept)", "name", "name_lc", "synonyms:string[]", "semantic_type", ":LABEL"],
+    "nodes_snomed.csv": ["id:ID(SNOMED)", ":LABEL"],
+}
+REL_FILES = {
+    "rels_has_snomed.csv": [":START_ID(Concept)", ":END_ID(SNOMED)", ":TYPE"],
+    "rels_umls_rel.csv": [":START_ID(Concept)", ":END_ID(Concept)", "type", ":TYPE"],
+    "rels_is_a.csv": [":START_ID(SNOMED)", ":END_ID(SNOMED)", "direct:boolean", ":TYPE"],
+}
+
+# RRF fields can never contain "|", so it is a safe delimiter for string[] columns
+ARRAY_DELIMITER = "|"
+
+
+def _semantic_types_path():
+    # Prefer MRSTY from the UMLS release, fall back to the SemGroups file used by the Bolt importer
+    mrsty = os.path.join(UMLS_DIR, "MRSTY.RRF")
+    if os.path.exists(mrsty):
+        return mrsty
+    return os.path.join(SEM_DIR, "SemGroups.txt")
+
+
+def _open_csv(out_dir, name, header):
+    f = open(os.path.join(out_dir, name), "w", encoding="utf-8", newline="")
+    w = csv.writer(f)
+    w.writerow(header)
+    return f, w
+
+
+def _grouped_dedup(rows, key_len: int = 1):
+    """
+    Drops duplicates within runs sharing the same leading key.
+    UMLS/SNOMED release files are sorted by their first column, so this
+    removes repeats without holding every row of the file in memory.
+    """
+    current = None
+    seen = set()
+    for row in rows:
+        key = row[:key_len]
+        if key != current:
+            current = key
+            seen = set()
+        if row in seen:
+            continue
+        seen.add(row)
+        yield row
+
+
+def export_semantic_types():
+    sem_path = _semantic_types_path()
+    if not os.path.exists(sem_path):
+        print(f"EXPORT: no semantic type file at {sem_path}, semantic_type left empty")
+        return {}
+
+    # Last value wins, matching repeated SET in import_semantic_types
+    with SourceReader(sem_path) as reader:
+        return dict(iter_semantic_rows(reader))
+
+
+def export_concepts(out_dir, semantic_types, filters: SourceFilter):
+    mrconso_path = os.path.join(UMLS_DIR, "MRCONSO.RRF")
+    if not os.path.exists(mrconso_path):
+        raise FileNotFoundError(f"MRCONSO.RRF not found at: {mrconso_path}")
+
+    cuis = set()
+    snomed_ids = set()
+    n_links = 0
+
+    fn, wn = _open_csv(out_dir, "nodes_concept.csv", NODE_FILES["nodes_concept.csv"])
+    fr, wr = _open_csv(out_dir, "rels_has_snomed.csv", REL_FILES["rels_has_snomed.csv"])
+    with fn, fr, SourceReader(mrconso_path) as reader:
+        # Same per-CUI aggregation as the Bolt importer: one row per concept
+        for c, _ in iter_concepts(reader, filters):
+            cui = c["cui"]
+            if cui in cuis:
+                continue
+            cuis.add(cui)
+            synonyms = ARRAY_DELIMITER.join(c["synonyms"])
+            wn.writerow([cui, c["name"], c["name"].lower(), synonyms, semantic_types.get(cui, ""), "Concept"])
+
+            for sid in c["sids"]:
+                snomed_ids.add(sid)
+                wr.writerow([cui, sid, "HAS_SNOMED"])
+                n_links += 1
+
+    print(f"EXPORT: {len(cuis)} Concept nodes, {n_links} HAS_SNOMED relationships")
+    return cuis, snomed_ids
+
+
+def export_relations(out_dir, cuis, filters: SourceFilter):
+    mrrel_path = os.path.join(UMLS_DIR, "MRREL.RRF")
+    if not os.path.exists(mrrel_path):
+        raise FileNotFoundError(f"MRREL.RRF not found at: {mrrel_path}")
+
+    n = 0
+    skipped = 0
+    f, w = _open_csv(out_dir, "rels_umls_rel.csv", REL_FILES["rels_umls_rel.csv"])
+    with f, SourceReader(mrrel_path) as reader:
+        for cui1, rel, cui2 in _grouped_dedup(iter_mrrel_rows(reader, filters)):
+            # Same semantics as MATCH ... MATCH ... MERGE: both ends must exist
+            if cui1 not in cuis or cui2 not in cuis:
+                skipped += 1
+                continue
+            w.writerow([cui1, cui2, rel, "UMLS_REL"])
+            n += 1
+
+    print(f"EXPORT: {n} UMLS_REL relationships ({skipped} with unknown CUI skipped)")
+
+
+def export_snomed(out_dir, snomed_ids, direct_only: bool = False):
+    if direct_only:
+        tc_file = DIRECT_ISA_FILE if os.path.exists(DIRECT_ISA_FILE) else build_direct_isa_file()
+    else:
+        tc_file = find_tc_file()
+    # Closure edges carry no flag (empty field = property not set)
+    direct = "true" if direct_only else ""
+
+    n = 0
+    f, w = _open_csv(out_dir, "rels_is_a.csv", REL_FILES["rels_is_a.csv"])
+    with f, SourceReader(tc_file) as reader:
+        for child, parent in _grouped_dedup(iter_tc_pairs(reader)):
+            snomed_ids.add(child)
+            snomed_ids.add(parent)
+            w.writerow([child, parent, direct, "IS_A"])
+            n += 1
+
+    f, w = _open_csv(out_dir, "nodes_snomed.csv", NODE_FILES["nodes_snomed.csv"])
+    with f:
+        for sid in sorted(snomed_ids):
+            w.writerow([sid, "SNOMED"])
+
+    print(f"EXPORT: {len(snomed_ids)} SNOMED nodes, {n} IS_A relationships")
+
+
+def admin_import_command(out_dir, database: str = "neo4j") -> str:
+    args = [f"--nodes={os.path.join(out_dir, name)}" for name in NODE_FILES]
+    args += [f"--relationships={os.path.join(out_dir, name)}" for name in REL_FILES]
+    args.append(f"--array-delimiter='{ARRAY_DELIMITER}'")
+    return "neo4j-admin database import full " + " ".join(args) + f" {database}"
+
+
+def export_all(out_dir, filters: SourceFilter = None, snomed_direct: bool = False):
+    """
+    Streams MRCONSO, MRREL, MRSTY and the SNOMED transitive closure into
+    deduplicated neo4j-admin import CSVs. No database connection is used.
+    """
+    filters = filters or SourceFilter()
+    os.makedirs(out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+
+    semantic_types = export_semantic_types()
+    cuis, snomed_ids = export_concepts(out_dir, semantic_types, filters)
+    del semantic_types
+    export_relations(out_dir, cuis, filters)
+    export_snomed(out_dir, snomed_ids, direct_only=snomed_direct)
+
+    filters.report("MRCONSO")
+    filters.report("MRREL")
+    print(f"EXPORT: done in {time.perf_counter() - t0:.1f}s -> {out_dir}")
+    print("EXPORT: load with (database stopped):")
+    print("  " + admin_import_command(out_dir))
+    print("EXPORT: then run build_big_kg.py --schema-only to create constraints and indexes")
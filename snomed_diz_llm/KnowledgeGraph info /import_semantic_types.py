@@ -1,25 +1,49 @@
 import os
 
+from kg_batch import DEFAULT_BATCH_SIZE, iter_batches, write_batch, SourceReader
+from kg_checkpoint import Checkpoint
+from kg_metrics import StageMetrics
+
 SEM_DIR = "KnowledgeGraph-info/kb_sources/semantic"
 
-def import_semantic_types(driver):
+SEMANTIC_TYPE_CYPHER = """
+    UNWIND $rows AS row
+    MATCH (c:Concept {cui:row.cui})
+    SET c.semantic_type = row.stype
+"""
+
+
+def iter_semantic_rows(lines):
+    # Expected format in your current codebase: parts[0]=CUI, parts[3]=semantic group/type
+    for line in lines:
+        parts = line.strip().split("|")
+        if len(parts) < 4:
+            continue
+        cui = parts[0].strip()
+        stype = parts[3].strip()
+        if not cui or not stype:
+            continue
+
+        yield cui, stype
+
+
+def import_semantic_types(driver, batch_size: int = DEFAULT_BATCH_SIZE):
     sem_path = os.path.join(SEM_DIR, "SemGroups.txt")
     if not os.path.exists(sem_path):
         raise FileNotFoundError(f"SemGroups.txt not found at: {sem_path}")
 
-    # Expected format in your current codebase: parts[0]=CUI, parts[3]=semantic group/type
-    with driver.session() as s:
-        with open(sem_path, "r", encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                parts = line.strip().split("|")
-                if len(parts) < 4:
-                    continue
-                cui = parts[0].strip()
-                stype = parts[3].strip()
-                if not cui or not stype:
-                    continue
-
-                s.run("""
-                    MATCH (c:Concept {cui:$cui})
-                    SET c.semantic_type = $stype
-                """, cui=cui, stype=stype)
+    ckpt = Checkpoint("SEMANTIC_TYPES", sem_path)
+    if ckpt.done:
+        print("IMPORT_SEMANTIC_TYPES: already complete (checkpoint)")
+        return
+
+    meter = StageMetrics("IMPORT_SEMANTIC_TYPES")
+
+    with driver.session() as s, SourceReader(sem_path, ckpt.offset) as reader:
+        for batch in iter_batches(iter_semantic_rows(reader), batch_size):
+            rows = [{"cui": cui, "stype": stype} for cui, stype in batch]
+            write_batch(s, [(SEMANTIC_TYPE_CYPHER, {"rows": rows})], metrics=meter, rows=len(batch))
+            ckpt.commit(reader.offset, len(batch))
+
+    ckpt.finish()
+    meter.done()
@@ -1,8 +1,33 @@
 import os
+import tempfile
+import itertools
+
+from kg_batch import DEFAULT_BATCH_SIZE, iter_batches, write_batch, SourceReader
+from kg_checkpoint import Checkpoint
+from kg_metrics import StageMetrics
 
 SNOMED_DIR = "KnowledgeGraph-info/kb_sources/snomed"
 
-def import_snomed_tc(driver):
+IS_A_CYPHER = """
+    UNWIND $rows AS row
+    MERGE (c:SNOMED {id:row.child})
+    MERGE (p:SNOMED {id:row.parent})
+    MERGE (c)-[:IS_A]->(p)
+"""
+
+IS_A_DIRECT_CYPHER = """
+    UNWIND $rows AS row
+    MERGE (c:SNOMED {id:row.child})
+    MERGE (p:SNOMED {id:row.parent})
+    MERGE (c)-[r:IS_A]->(p)
+    SET r.direct = true
+"""
+
+# child \t parent, one line per direct is-a edge; also read by snomed_hierarchy.py
+DIRECT_ISA_FILE = os.path.join(SNOMED_DIR, "snomed_isa_direct.tsv")
+IS_A_TYPE_ID = "116680003"
+
+def find_tc_file():
     # Auto-detect, then fallback to your known filename
     tc_file = None
     if os.path.isdir(SNOMED_DIR):
@@ -19,23 +44,167 @@ def import_snomed_tc(driver):
 
     if not tc_file:
         raise FileNotFoundError("No SNOMED transitive closure file found in KnowledgeGraph-info/kb_sources/snomed")
+    return tc_file
+
+
+def iter_tc_pairs(lines, skip_header: bool = True):
+    lines = iter(lines)
+    if skip_header:
+        header = next(lines, None)  # skip header if present
+    for line in lines:
+        parts = line.strip().split("\t")
+        if len(parts) < 2:
+            continue
+
+        # Many TC files are: child \t parent
+        child = parts[0].strip()
+        parent = parts[1].strip()
+        if not child or not parent:
+            continue
+
+        yield child, parent
+
+
+def find_relationship_file():
+    # RF2 stated/inferred relationship snapshot, if the release ships one
+    if not os.path.isdir(SNOMED_DIR):
+        return None
+    for root, _, files in os.walk(SNOMED_DIR):
+        for f in sorted(files):
+            if f.startswith("sct2_Relationship_Snapshot"):
+                return os.path.join(root, f)
+    return None
+
+
+def iter_rf2_isa(lines):
+    # id|effectiveTime|active|moduleId|sourceId|destinationId|relationshipGroup|typeId|...
+    lines = iter(lines)
+    next(lines, None)  # header
+    for line in lines:
+        parts = line.rstrip("\n").split("\t")
+        if len(parts) < 8:
+            continue
+        if parts[2] == "1" and parts[7] == IS_A_TYPE_ID:
+            yield parts[4], parts[5]
+
+
+def _spool_pairs(pairs, path: str, block: int = 1_000_000) -> int:
+    """
+    Appends (child, parent) ids as int64 pairs to a binary file; returns
+    the pair count. Only one block is held in memory.
+    """
+    import numpy as np
+
+    n = 0
+    with open(path, "wb") as f:
+        while True:
+            flat = np.fromiter(
+                (int(x) for pair in itertools.islice(pairs, block) if pair[0] != pair[1] for x in pair),
+                dtype=np.int64,
+            )
+            if not len(flat):
+                break
+            flat.tofile(f)
+            n += len(flat) // 2
+    return n
+
+
+def transitive_reduction(pairs, block: int = 1_000_000):
+    """
+    Direct parents from a transitive closure: p is direct for c when no
+    other ancestor of c has p as an ancestor. The closure is spooled to
+    disk and counting-sorted by child into memory-mapped CSR arrays, so
+    memory stays at a few bytes per pair in the page cache instead of
+    Python sets; each child is then reduced on its own. Yields
+    (child, parent) grouped by child in ascending id order.
+    """
+    import numpy as np
+
+    with tempfile.TemporaryDirectory(prefix="snomed_tc_") as tmp:
+        raw_path = os.path.join(tmp, "pairs.bin")
+        n = _spool_pairs(iter(pairs), raw_path, block)
+        if not n:
+            return
+        raw = np.memmap(raw_path, dtype=np.int64, mode="r", shape=(n, 2))
+
+        ids = np.unique(np.concatenate([np.unique(raw[i:i + block]) for i in range(0, n, block)]))
+        counts = np.zeros(len(ids), dtype=np.int64)
+        for i in range(0, n, block):
+            counts += np.bincount(np.searchsorted(ids, raw[i:i + block, 0]), minlength=len(ids))
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+
+        # Counting sort by child: scatter parent indices block by block
+        indices = np.memmap(os.path.join(tmp, "indices.bin"), dtype=np.int32, mode="w+", shape=(n,))
+        fill = indptr[:-1].copy()
+        for i in range(0, n, block):
+            c = np.searchsorted(ids, raw[i:i + block, 0])
+            p = np.searchsorted(ids, raw[i:i + block, 1]).astype(np.int32)
+            order = np.argsort(c, kind="stable")
+            c, p = c[order], p[order]
+            starts = np.searchsorted(c, c, side="left")
+            pos = fill[c] + (np.arange(len(c)) - starts)
+            indices[pos] = p
+            np.add.at(fill, c, 1)
+        del raw
+
+        for c in np.nonzero(counts)[0]:
+            anc = np.unique(indices[indptr[c]:indptr[c + 1]])
+            covered = [indices[indptr[q]:indptr[q + 1]] for q in anc if counts[q]]
+            direct = np.setdiff1d(anc, np.concatenate(covered)) if covered else anc
+            child = str(ids[c])
+            for parent in ids[direct]:
+                yield child, str(parent)
+        del indices
+
+
+def build_direct_isa_file(out_path: str = DIRECT_ISA_FILE) -> str:
+    """
+    Writes the direct is-a edges, streamed from the RF2 relationship
+    snapshot when available, otherwise derived from the transitive closure.
+    """
+    rel_file = find_relationship_file()
+    src = rel_file or find_tc_file()
+    print(f"SNOMED: deriving direct is-a edges from {src}")
+    if not rel_file:
+        print("SNOMED: no RF2 relationship snapshot, reducing the closure (slow; spools to a temp dir)")
+
+    with SourceReader(src) as reader:
+        pairs = iter_rf2_isa(reader) if rel_file else transitive_reduction(iter_tc_pairs(reader))
+        n = 0
+        with open(out_path, "w", encoding="utf-8") as out:
+            out.write("child\tparent\n")
+            for child, parent in pairs:
+                out.write(f"{child}\t{parent}\n")
+                n += 1
+
+    print(f"SNOMED: {n} direct is-a edges -> {out_path}")
+    return out_path
+
+
+def import_snomed_tc(driver, batch_size: int = DEFAULT_BATCH_SIZE, direct_only: bool = False):
+    if direct_only:
+        # Only direct is-a edges; ancestors are computed on demand at query time
+        tc_file = DIRECT_ISA_FILE if os.path.exists(DIRECT_ISA_FILE) else build_direct_isa_file()
+        source, cypher = "SNOMED_ISA_DIRECT", IS_A_DIRECT_CYPHER
+    else:
+        tc_file = find_tc_file()
+        source, cypher = "SNOMED_TC", IS_A_CYPHER
+
+    ckpt = Checkpoint(source, tc_file)
+    if ckpt.done:
+        print(f"IMPORT_{source}: already complete (checkpoint)")
+        return
+
+    meter = StageMetrics(f"IMPORT_{source}")
+
+    with driver.session() as s, SourceReader(tc_file, ckpt.offset) as reader:
+        # The header only sits at byte 0, not at a resume offset
+        pairs = iter_tc_pairs(reader, skip_header=ckpt.offset == 0)
+        for batch in iter_batches(pairs, batch_size):
+            rows = [{"child": child, "parent": parent} for child, parent in batch]
+            write_batch(s, [(cypher, {"rows": rows})], metrics=meter, rows=len(batch))
+            ckpt.commit(reader.offset, len(batch))
 
-    with driver.session() as s:
-        with open(tc_file, "r", encoding="utf-8", errors="ignore") as f:
-            header = next(f, None)  # skip header if present
-            for line in f:
-                parts = line.strip().split("\t")
-                if len(parts) < 2:
-                    continue
-
-                # Many TC files are: child \t parent
-                child = parts[0].strip()
-                parent = parts[1].strip()
-                if not child or not parent:
-                    continue
-
-                s.run("""
-                    MERGE (c:SNOMED {id:$child})
-                    MERGE (p:SNOMED {id:$parent})
-                    MERGE (c)-[:IS_A]->(p)
-                """, child=child, parent=parent)
+    ckpt.finish()
+    meter.done()
@@ -1,39 +1,111 @@
 import os
 
+from kg_batch import DEFAULT_BATCH_SIZE, iter_batches, write_batch, SourceReader
+from kg_checkpoint import Checkpoint
+from kg_filters import SourceFilter
+from kg_metrics import StageMetrics
+
 UMLS_DIR = "KnowledgeGraph-info/kb_sources/umls"
 
-def import_umls_concepts(driver):
+# One write per concept: preferred name plus every distinct synonym
+CONCEPTS_CYPHER = """
+    UNWIND $rows AS row
+    MERGE (c:Concept {cui:row.cui})
+    SET c.name=row.name, c.name_lc=toLower(row.name), c.synonyms=row.synonyms
+"""
+
+HAS_SNOMED_CYPHER = """
+    UNWIND $rows AS row
+    MATCH (c:Concept {cui:row.cui})
+    UNWIND row.sids AS sid
+    MERGE (sn:SNOMED {id:sid})
+    MERGE (c)-[:HAS_SNOMED]->(sn)
+"""
+
+
+def iter_mrconso_rows(lines, filters: SourceFilter = None):
+    # MRCONSO: CUI|LAT|TS|LUI|STT|SUI|ISPREF|...|SAB(col11)|...|CODE(col13)|STR(col14)|...
+    for line in lines:
+        cols = line.split("|")
+        if len(cols) < 15:
+            continue
+        if filters and not filters.keep_mrconso(cols):
+            continue
+
+        cui = cols[0].strip()
+        sab = cols[11].strip()
+        code = cols[13].strip()
+        term = cols[14].strip()
+
+        if not cui or not term:
+            continue
+
+        # Lower is better: English, preferred term status, preferred string, preferred atom
+        rank = (cols[1] != "ENG", cols[2] != "P", cols[4] != "PF", cols[6] != "Y")
+        yield cui, sab, code, term, rank
+
+
+def _concept(cui, atoms):
+    name = min(atoms, key=lambda a: a[3])[2]
+    synonyms = []
+    seen = set()
+    sids = []
+    for sab, code, term, _ in atoms:
+        if term.lower() not in seen:
+            seen.add(term.lower())
+            synonyms.append(term)
+        # Link UMLS Concept to SNOMED conceptId when MRCONSO atom is SNOMEDCT
+        if sab.upper().startswith("SNOMEDCT") and code and code not in sids:
+            sids.append(code)
+    return {"cui": cui, "name": name, "synonyms": synonyms, "sids": sids, "atoms": len(atoms)}
+
+
+def iter_concepts(reader: SourceReader, filters: SourceFilter = None):
+    """
+    Groups the CUI-sorted MRCONSO stream into one record per concept.
+    Yields (concept, resume_offset): resume_offset is where the next
+    concept starts, so a checkpoint never splits a concept.
+    """
+    cui, atoms = None, []
+    for row_cui, sab, code, term, rank in iter_mrconso_rows(reader, filters):
+        if row_cui != cui:
+            if atoms:
+                yield _concept(cui, atoms), reader.line_start
+            cui, atoms = row_cui, []
+        atoms.append((sab, code, term, rank))
+    if atoms:
+        yield _concept(cui, atoms), reader.offset
+
+
+def import_umls_concepts(driver, batch_size: int = DEFAULT_BATCH_SIZE, filters: SourceFilter = None):
     mrconso_path = os.path.join(UMLS_DIR, "MRCONSO.RRF")
     if not os.path.exists(mrconso_path):
         raise FileNotFoundError(f"MRCONSO.RRF not found at: {mrconso_path}")
 
-    # MRCONSO: CUI|...|SAB(col11)|...|CODE(col13)|STR(col14)|...
-    with driver.session() as s:
-        with open(mrconso_path, "r", encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                cols = line.split("|")
-                if len(cols) < 15:
-                    continue
-
-                cui = cols[0].strip()
-                sab = cols[11].strip()
-                code = cols[13].strip()
-                term = cols[14].strip()
-
-                if not cui or not term:
-                    continue
-
-                s.run("""
-                    MERGE (c:Concept {cui:$cui})
-                    ON CREATE SET c.name=$name, c.name_lc=toLower($name)
-                    ON MATCH  SET c.name=coalesce(c.name, $name),
-                                  c.name_lc=coalesce(c.name_lc, toLower($name))
-                """, cui=cui, name=term)
-
-                # Link UMLS Concept to SNOMED conceptId when MRCONSO atom is SNOMEDCT
-                if sab.upper().startswith("SNOMEDCT") and code:
-                    s.run("""
-                        MATCH (c:Concept {cui:$cui})
-                        MERGE (sn:SNOMED {id:$sid})
-                        MERGE (c)-[:HAS_SNOMED]->(sn)
-                    """, cui=cui, sid=code)
+    filters = filters or SourceFilter()
+    ckpt = Checkpoint("MRCONSO", mrconso_path, tag=filters.fingerprint())
+    if ckpt.done:
+        print("IMPORT_UMLS_CONCEPTS: already complete (checkpoint)")
+        return
+
+    meter = StageMetrics("IMPORT_UMLS_CONCEPTS")
+
+    with driver.session() as s, SourceReader(mrconso_path, ckpt.offset) as reader:
+        # batch_size counts concepts here, each concept carries all of its atoms
+        for batch in iter_batches(iter_concepts(reader, filters), batch_size):
+            concepts = [c for c, _ in batch]
+            nodes = [{k: c[k] for k in ("cui", "name", "synonyms")} for c in concepts]
+            links = [{"cui": c["cui"], "sids": c["sids"]} for c in concepts if c["sids"]]
+
+            atoms = sum(c["atoms"] for c in concepts)
+            write_batch(s, [
+                (CONCEPTS_CYPHER, {"rows": nodes}),
+                (HAS_SNOMED_CYPHER, {"rows": links}),
+            ], metrics=meter, rows=atoms)
+            ckpt.commit(batch[-1][1], atoms)
+
+    ckpt.finish()
+    counts = filters.counts["MRCONSO"]
+    meter.set_read(counts["read"], counts["read"] - counts["kept"])
+    meter.done()
+    filters.report("MRCONSO")
@@ -1,28 +1,184 @@
 import os
+import zlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from kg_batch import DEFAULT_BATCH_SIZE, iter_batches, write_batch, SourceReader
+from kg_checkpoint import Checkpoint
+from kg_filters import SourceFilter
+from kg_metrics import StageMetrics
 
 UMLS_DIR = "KnowledgeGraph-info/kb_sources/umls"
 
-def import_umls_relations(driver):
+DEFAULT_WORKERS = int(os.getenv("KG_REL_WORKERS", "1"))
+
+UMLS_REL_CYPHER = """
+    UNWIND $rows AS row
+    MATCH (a:Concept {cui:row.c1})
+    MATCH (b:Concept {cui:row.c2})
+    MERGE (a)-[:UMLS_REL {type:row.rel}]->(b)
+"""
+
+
+def iter_mrrel_rows(lines, filters: SourceFilter = None):
+    for line in lines:
+        cols = line.split("|")
+        if len(cols) < 6:
+            continue
+        if filters and not filters.keep_mrrel(cols):
+            continue
+
+        cui1 = cols[0].strip()
+        rel = cols[3].strip()
+        cui2 = cols[4].strip()
+
+        if not cui1 or not cui2 or not rel:
+            continue
+
+        yield cui1, rel, cui2
+
+
+def _rel_params(batch):
+    return {"rows": [{"c1": c1, "rel": rel, "c2": c2} for c1, rel, c2 in batch]}
+
+
+# --------------------------------------------------
+# Lock-aware partitioning
+# --------------------------------------------------
+# MERGE (a)-[:UMLS_REL]->(b) locks both a and b. Concepts are hashed into
+# n_parts partitions and every row goes to the cell {part(a), part(b)}.
+# Cells are then scheduled in rounds where no two cells share a partition
+# (round-robin tournament), so concurrent transactions never touch the
+# same node and cannot deadlock against each other.
+def _partition(cui: str, n_parts: int) -> int:
+    return zlib.crc32(cui.encode("utf-8")) % n_parts
+
+
+def _cell(cui1: str, cui2: str, n_parts: int):
+    p1 = _partition(cui1, n_parts)
+    p2 = _partition(cui2, n_parts)
+    return (p1, p2) if p1 <= p2 else (p2, p1)
+
+
+def schedule_rounds(n_parts: int):
+    """
+    Yields lists of cells; cells within one list use disjoint partitions.
+    n_parts must be even.
+    """
+    # All diagonal cells (i, i) are independent of each other
+    yield [(i, i) for i in range(n_parts)]
+
+    # Circle method: n_parts - 1 rounds of n_parts / 2 disjoint pairs
+    m = n_parts - 1
+    for r in range(m):
+        cells = [tuple(sorted((r, m)))]
+        for i in range(1, n_parts // 2):
+            a = (r + i) % m
+            b = (r - i) % m
+            cells.append((a, b) if a <= b else (b, a))
+        yield cells
+
+
+def _spill_cells(mrrel_path, n_parts: int, tmp_dir: str, flush_every: int, filters: SourceFilter):
+    """
+    Streams MRREL once and appends each row to its cell file on disk.
+    Only flush_every rows per cell are buffered in memory.
+    """
+    buffers = {}
+    counts = {}
+
+    def _flush(cell):
+        rows = buffers.pop(cell, None)
+        if not rows:
+            return
+        with open(_cell_path(tmp_dir, cell), "a", encoding="utf-8") as f:
+            f.writelines(f"{c1}|{rel}|{c2}\n" for c1, rel, c2 in rows)
+
+    with SourceReader(mrrel_path) as reader:
+        for row in iter_mrrel_rows(reader, filters):
+            cell = _cell(row[0], row[2], n_parts)
+            buffers.setdefault(cell, []).append(row)
+            counts[cell] = counts.get(cell, 0) + 1
+            if len(buffers[cell]) >= flush_every:
+                _flush(cell)
+
+    for cell in list(buffers):
+        _flush(cell)
+    return counts
+
+
+def _cell_path(tmp_dir: str, cell) -> str:
+    return os.path.join(tmp_dir, f"cell_{cell[0]:03d}_{cell[1]:03d}.rrf")
+
+
+def _iter_cell_rows(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            c1, rel, c2 = line.rstrip("\n").split("|")
+            yield c1, rel, c2
+
+
+def _import_cell(driver, cell, path, batch_size: int, meter: StageMetrics, ckpt: Checkpoint):
+    # execute_write retries transient errors (incl. DeadlockDetected) on its own
+    n = 0
+    with driver.session() as s:
+        for batch in iter_batches(_iter_cell_rows(path), batch_size):
+            write_batch(s, [(UMLS_REL_CYPHER, _rel_params(batch))], metrics=meter, rows=len(batch))
+            n += len(batch)
+    # Cells are the unit of resume in sharded mode
+    ckpt.commit_cell(cell, n)
+
+
+def _import_sharded(driver, mrrel_path, batch_size: int, workers: int, meter: StageMetrics, ckpt: Checkpoint,
+                    filters: SourceFilter):
+    n_parts = 2 * workers
+    if ckpt.state.get("n_parts") != n_parts:
+        # Cell ids only mean something for the same partition count
+        ckpt.state["n_parts"] = n_parts
+        ckpt.state["cells_done"] = []
+        ckpt.state["rows"] = 0
+
+    with tempfile.TemporaryDirectory(prefix="mrrel_cells_") as tmp_dir:
+        counts = _spill_cells(mrrel_path, n_parts, tmp_dir, flush_every=batch_size, filters=filters)
+        print(f"IMPORT_UMLS_RELATIONS: {sum(counts.values())} rows in {len(counts)} cells, "
+              f"{n_parts} partitions, {workers} workers")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for cells in schedule_rounds(n_parts):
+                futures = [
+                    pool.submit(_import_cell, driver, cell, _cell_path(tmp_dir, cell), batch_size, meter, ckpt)
+                    for cell in cells
+                    if counts.get(cell) and not ckpt.is_cell_done(cell)
+                ]
+                # Round barrier: the next round reuses the same partitions
+                for fut in futures:
+                    fut.result()
+
+
+def import_umls_relations(driver, batch_size: int = DEFAULT_BATCH_SIZE, workers: int = DEFAULT_WORKERS,
+                          filters: SourceFilter = None):
     mrrel_path = os.path.join(UMLS_DIR, "MRREL.RRF")
     if not os.path.exists(mrrel_path):
         raise FileNotFoundError(f"MRREL.RRF not found at: {mrrel_path}")
 
-    with driver.session() as s:
-        with open(mrrel_path, "r", encoding="utf-8", errors="ignore") as f:
-            for line in f:
-                cols = line.split("|")
-                if len(cols) < 6:
-                    continue
-
-                cui1 = cols[0].strip()
-                rel = cols[3].strip()
-                cui2 = cols[4].strip()
-
-                if not cui1 or not cui2 or not rel:
-                    continue
-
-                s.run("""
-                    MATCH (a:Concept {cui:$c1})
-                    MATCH (b:Concept {cui:$c2})
-                    MERGE (a)-[:UMLS_REL {type:$rel}]->(b)
-                """, c1=cui1, c2=cui2, rel=rel)
+    filters = filters or SourceFilter()
+    ckpt = Checkpoint("MRREL", mrrel_path, tag=filters.fingerprint())
+    if ckpt.done:
+        print("IMPORT_UMLS_RELATIONS: already complete (checkpoint)")
+        return
+
+    meter = StageMetrics("IMPORT_UMLS_RELATIONS")
+
+    if workers > 1:
+        _import_sharded(driver, mrrel_path, batch_size, workers, meter, ckpt, filters)
+    else:
+        with driver.session() as s, SourceReader(mrrel_path, ckpt.offset) as reader:
+            for batch in iter_batches(iter_mrrel_rows(reader, filters), batch_size):
+                write_batch(s, [(UMLS_REL_CYPHER, _rel_params(batch))], metrics=meter, rows=len(batch))
+                ckpt.commit(reader.offset, len(batch))
+
+    ckpt.finish()
+    counts = filters.counts["MRREL"]
+    meter.set_read(counts["read"], counts["read"] - counts["kept"])
+    meter.done()
+    filters.report("MRREL")
@@ -0,0 +1,72 @@
+import os
+import time
+
+DEFAULT_BATCH_SIZE = int(os.getenv("KG_BATCH_SIZE", "10000"))
+
+
+def iter_batches(rows, batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Group an iterable of rows into lists of at most batch_size items
+    """
+    batch_size = max(1, int(batch_size))
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_batch(session, statements, metrics=None, rows: int = 0):
+    """
+    Run [(cypher, params), ...] inside ONE explicit write transaction.
+    Statements with empty UNWIND lists are skipped. With `metrics`
+    (a kg_metrics.StageMetrics) the commit latency, row count and the
+    number of driver retries are recorded.
+    """
+    statements = [(q, p) for q, p in statements if any(p.values())]
+    if not statements:
+        return
+
+    attempts = [0]
+
+    def _work(tx):
+        attempts[0] += 1
+        for query, params in statements:
+            tx.run(query, **params).consume()
+
+    t0 = time.perf_counter()
+    session.execute_write(_work)
+    if metrics is not None:
+        metrics.record_batch(rows, time.perf_counter() - t0, attempts[0])
+
+
+class SourceReader:
+    """
+    Iterates decoded lines of a source file starting at a byte offset.
+    `offset` is the byte position right after the last line handed out,
+    i.e. where a resumed import has to seek to; `line_start` is where
+    that last line began.
+    """
+
+    def __init__(self, path: str, start: int = 0):
+        self.path = path
+        self.offset = start
+        self.line_start = start
+        self._f = None
+
+    def __enter__(self):
+        self._f = open(self.path, "rb")
+        self._f.seek(self.offset)
+        return self
+
+    def __exit__(self, *exc):
+        self._f.close()
+
+    def __iter__(self):
+        for raw in self._f:
+            self.line_start = self.offset
+            self.offset += len(raw)
+            yield raw.decode("utf-8", errors="ignore")
@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import threading
+
+CHECKPOINT_FILE = os.getenv("KG_CHECKPOINT_FILE", "KnowledgeGraph-info/kb_sources/import_checkpoints.json")
+
+_LOCK = threading.RLock()
+
+
+def release_version(path: str) -> str:
+    """
+    UMLS ships release.dat next to the RRF files (e.g. "2024AA").
+    The file size is appended so a re-downloaded or edited file never
+    resumes from a stale offset.
+    """
+    release = ""
+    release_dat = os.path.join(os.path.dirname(path), "release.dat")
+    if os.path.exists(release_dat):
+        with open(release_dat, "r", encoding="utf-8", errors="ignore") as f:
+            release = f.readline().strip()
+    return f"{release or 'unknown'}:{os.path.getsize(path)}"
+
+
+def load_checkpoints(store: str = CHECKPOINT_FILE) -> dict:
+    if not os.path.exists(store):
+        return {}
+    with open(store, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_checkpoints(data: dict, store: str):
+    os.makedirs(os.path.dirname(store) or ".", exist_ok=True)
+    tmp = store + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    # Atomic on POSIX and Windows: a crash never leaves a half-written file
+    os.replace(tmp, store)
+
+
+def reset_checkpoints(store: str = CHECKPOINT_FILE):
+    if os.path.exists(store):
+        os.remove(store)
+
+
+class Checkpoint:
+    """
+    Progress of one import source, persisted after every committed batch.
+    A checkpoint recorded for another file, release or tag is ignored.
+    """
+
+    def __init__(self, source: str, path: str, store: str = CHECKPOINT_FILE, tag: str = ""):
+        self.source = source
+        self.store = store
+        # tag: anything else that changes what gets written, e.g. the filter config
+        self.state = {
+            "file": os.path.abspath(path),
+            "release": release_version(path) + (f":{tag}" if tag else ""),
+            "offset": 0,
+            "rows": 0,
+            "done": False,
+            "cells_done": [],
+        }
+
+        prev = load_checkpoints(store).get(source)
+        if prev and prev.get("file") == self.state["file"] and prev.get("release") == self.state["release"]:
+            self.state.update(prev)
+            if not self.done and (self.state["offset"] or self.state["cells_done"]):
+                print(f"CHECKPOINT {source}: resuming at byte {self.state['offset']} "
+                      f"({self.state['rows']} rows already committed)")
+
+    @property
+    def offset(self) -> int:
+        return self.state["offset"]
+
+    @property
+    def done(self) -> bool:
+        return self.state["done"]
+
+    def commit(self, offset: int, rows: int):
+        self.state["offset"] = offset
+        self._advance(rows)
+
+    def commit_cell(self, cell, rows: int):
+        with _LOCK:
+            self.state["cells_done"].append(list(cell))
+            self._advance(rows)
+
+    def is_cell_done(self, cell) -> bool:
+        return list(cell) in self.state["cells_done"]
+
+    def finish(self):
+        self.state["done"] = True
+        self._advance(0)
+
+    def _advance(self, rows: int):
+        with _LOCK:
+            self.state["rows"] += rows
+            self.state["updated"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            data = load_checkpoints(self.store)
+            data[self.source] = self.state
+            _save_checkpoints(data, self.store)
+
+
+def print_status(store: str = CHECKPOINT_FILE):
+    data = load_checkpoints(store)
+    if not data:
+        print(f"No checkpoints in {store}")
+        return
+
+    for source, st in sorted(data.items()):
+        path = st.get("file", "")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if st.get("done"):
+            progress = "done"
+        elif st.get("cells_done"):
+            progress = f"{len(st['cells_done'])} cells"
+        elif size:
+            progress = f"{100.0 * st.get('offset', 0) / size:.1f}%"
+        else:
+            progress = "source missing"
+        print(f"{source:<16} {progress:>10}  rows={st.get('rows', 0):<12} "
+              f"release={st.get('release', '')}  updated={st.get('updated', '')}")
@@ -0,0 +1,97 @@
+import os
+import json
+import hashlib
+from collections import Counter
+
+FILTERS_FILE = os.getenv("KG_FILTERS")
+
+# MRCONSO: CUI|LAT|TS|LUI|STT|SUI|ISPREF|AUI|SAUI|SCUI|SDUI|SAB|TTY|CODE|STR|SRL|SUPPRESS|CVF
+MRCONSO_COLS = {"lat": 1, "ispref": 6, "sab": 11, "tty": 12, "suppress": 16}
+# MRREL: CUI1|AUI1|STYPE1|REL|CUI2|AUI2|STYPE2|RELA|RUI|SRUI|SAB|SL|RG|DIR|SUPPRESS|CVF
+MRREL_COLS = {"rel": 3, "rela": 7, "sab": 10, "suppress": 14}
+
+# MRREL lists every relationship in both directions. For inverse pairs only
+# the left one is kept; symmetric ones are kept once, with CUI1 < CUI2.
+INVERSE_OF = {"CHD": "PAR", "RN": "RB", "QB": "AQ"}
+SYMMETRIC_RELS = {"SIB", "RO", "RL", "RQ", "SY", "RU", "XR"}
+
+
+class SourceFilter:
+    """
+    Config-driven row filters applied while the RRF files are streamed,
+    before anything is sent to Neo4j. Each key is an allow-list; an empty
+    or missing list means "keep everything". Example config:
+
+        {
+          "mrconso": {"lat": ["ENG"], "sab": ["SNOMEDCT_US", "MSH"],
+                      "suppress": ["N"], "tty": [], "ispref": ["Y"]},
+          "mrrel": {"rel": ["PAR", "RB", "RO"], "rela": [], "sab": [],
+                    "suppress": ["N"], "one_direction": true}
+        }
+    """
+
+    def __init__(self, config: dict = None):
+        config = config or {}
+        self.config = config
+        self.mrconso = self._allow_lists(config.get("mrconso"), MRCONSO_COLS)
+        mrrel_cfg = config.get("mrrel") or {}
+        self.mrrel = self._allow_lists(mrrel_cfg, MRREL_COLS)
+        self.one_direction = bool(mrrel_cfg.get("one_direction"))
+        self.counts = {"MRCONSO": Counter(), "MRREL": Counter()}
+
+    @staticmethod
+    def _allow_lists(cfg, columns):
+        cfg = cfg or {}
+        return [
+            (name, col, {str(v).upper() for v in cfg[name]})
+            for name, col in columns.items()
+            if cfg.get(name)
+        ]
+
+    @classmethod
+    def from_file(cls, path: str = FILTERS_FILE):
+        if not path:
+            return cls()
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Filter config not found at: {path}")
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def fingerprint(self) -> str:
+        # Part of the checkpoint key: a resume must use the same filters
+        raw = json.dumps(self.config, sort_keys=True)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+    def _keep(self, source, cols, allow_lists) -> bool:
+        c = self.counts[source]
+        c["read"] += 1
+        for name, idx, allowed in allow_lists:
+            value = cols[idx].strip().upper() if idx < len(cols) else ""
+            if value not in allowed:
+                c[name] += 1
+                return False
+        return True
+
+    def keep_mrconso(self, cols) -> bool:
+        if not self._keep("MRCONSO", cols, self.mrconso):
+            return False
+        self.counts["MRCONSO"]["kept"] += 1
+        return True
+
+    def keep_mrrel(self, cols) -> bool:
+        if not self._keep("MRREL", cols, self.mrrel):
+            return False
+        if self.one_direction:
+            rel = cols[3].strip().upper()
+            if rel in INVERSE_OF or (rel in SYMMETRIC_RELS and cols[0].strip() > cols[4].strip()):
+                self.counts["MRREL"]["one_direction"] += 1
+                return False
+        self.counts["MRREL"]["kept"] += 1
+        return True
+
+    def report(self, source: str):
+        c = self.counts[source]
+        if not c:
+            return
+        removed = ", ".join(f"{k}={v}" for k, v in sorted(c.items()) if k not in ("read", "kept"))
+        print(f"FILTER {source}: read={c['read']} kept={c['kept']} removed: {removed or 'none'}")
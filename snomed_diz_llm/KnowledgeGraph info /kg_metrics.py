@@ -0,0 +1,136 @@
+import os
+import csv
+import json
+import time
+import random
+import threading
+
+REPORT_DIR = os.getenv("KG_REPORT_DIR", "KnowledgeGraph-info/reports")
+
+# Latency samples kept per stage (reservoir), enough for stable p99
+MAX_SAMPLES = 10000
+
+_STAGES = []
+
+
+def percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    k = min(len(s) - 1, max(0, int(round(q / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+class StageMetrics:
+    """
+    Counters for one import stage: rows read / filtered / written, batches
+    committed, retries and transaction latency. Printed every `every`
+    seconds and collected into the run report. Safe to share between
+    worker threads.
+    """
+
+    def __init__(self, stage: str, every: float = 10.0):
+        self.stage = stage
+        self.every = every
+        self.rows_read = 0
+        self.rows_filtered = 0
+        self.rows_written = 0
+        self.batches = 0
+        self.retries = 0
+        self.write_seconds = 0.0
+        self._latencies = []
+        self._n_latencies = 0
+        self.t0 = time.perf_counter()
+        self.t1 = None
+        self._last = self.t0
+        self._lock = threading.Lock()
+        _STAGES.append(self)
+
+    def elapsed(self) -> float:
+        return (self.t1 or time.perf_counter()) - self.t0
+
+    def rate(self) -> float:
+        elapsed = self.elapsed()
+        return self.rows_written / elapsed if elapsed > 0 else 0.0
+
+    def record_batch(self, rows: int, latency: float, attempts: int = 1):
+        with self._lock:
+            self.rows_written += rows
+            self.batches += 1
+            self.retries += max(0, attempts - 1)
+            self.write_seconds += latency
+            self._n_latencies += 1
+            if len(self._latencies) < MAX_SAMPLES:
+                self._latencies.append(latency)
+            else:
+                j = random.randrange(self._n_latencies)
+                if j < MAX_SAMPLES:
+                    self._latencies[j] = latency
+
+            now = time.perf_counter()
+            if now - self._last < self.every:
+                return
+            self._last = now
+        # Outside the lock: _line() takes a snapshot, which locks again
+        print(self._line())
+
+    def set_read(self, read: int, filtered: int = 0):
+        # Stages without a filter report rows read == rows written
+        with self._lock:
+            self.rows_read = read
+            self.rows_filtered = filtered
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lat = list(self._latencies)
+        elapsed = self.elapsed()
+        return {
+            "stage": self.stage,
+            "rows_read": self.rows_read or self.rows_written,
+            "rows_filtered": self.rows_filtered,
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "tx_p50_ms": round(1000 * percentile(lat, 50), 2),
+            "tx_p95_ms": round(1000 * percentile(lat, 95), 2),
+            "tx_p99_ms": round(1000 * percentile(lat, 99), 2),
+            "elapsed_s": round(elapsed, 2),
+            # Time in transactions vs. everything else (parsing, filtering, spilling)
+            "write_s": round(self.write_seconds, 2),
+            "parse_s": round(max(0.0, elapsed - self.write_seconds), 2),
+            "rows_per_s": round(self.rate(), 1),
+        }
+
+    def _line(self) -> str:
+        m = self.snapshot()
+        return (f"{self.stage}: {m['rows_written']} rows, {m['batches']} batches, "
+                f"{m['rows_per_s']:.0f} rows/sec, tx p50={m['tx_p50_ms']}ms "
+                f"p95={m['tx_p95_ms']}ms, retries={m['retries']}")
+
+    def done(self):
+        self.t1 = time.perf_counter()
+        print(f"{self.stage}: done, {self._line().split(': ', 1)[1]} in {self.elapsed():.1f}s")
+
+
+def write_run_report(out_dir: str = REPORT_DIR):
+    """
+    Writes kg_run_<timestamp>.json and .csv with one entry per stage
+    """
+    if not _STAGES:
+        return None
+    os.makedirs(out_dir, exist_ok=True)
+    ts = time.strftime("%Y%m%d_%H%M%S")
+    stages = [m.snapshot() for m in _STAGES]
+
+    json_path = os.path.join(out_dir, f"kg_run_{ts}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"run": ts, "stages": stages}, f, indent=2)
+
+    csv_path = os.path.join(out_dir, f"kg_run_{ts}.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(stages[0]))
+        w.writeheader()
+        w.writerows(stages)
+
+    print(f"KG_METRICS: run report -> {json_path}")
+    return json_path
@@ -0,0 +1,18 @@
+import threading
+
+from kg_metrics import StageMetrics
+
+
+def test_record_batch_prints_progress_without_deadlock():
+    # every=0 prints a progress line on every batch
+    m = StageMetrics("TEST", every=0.0)
+    t = threading.Thread(target=lambda: [m.record_batch(5, 0.01, attempts=2) for _ in range(3)],
+                         daemon=True)
+    t.start()
+    t.join(timeout=5)
+    assert not t.is_alive(), "record_batch hung"
+
+    snap = m.snapshot()
+    assert snap["rows_written"] == 15
+    assert snap["batches"] == 3
+    assert snap["retries"] == 3
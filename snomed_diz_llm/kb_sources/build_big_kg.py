@@ -1,5 +1,8 @@
 import os
 import csv
+import json
+import time
+import random
 from neo4j import GraphDatabase
 from tqdm import tqdm
 from utils import clean_triple
@@ -20,27 +23,168 @@ def get_driver():
 
 driver = get_driver()
 
+REPORT_DIR = os.getenv("KG_REPORT_DIR", "kb_sources/reports")
+
+
+# ---------------------------------------------------
+# Per-stage metrics
+# Same counters, sampling and report files as
+# KnowledgeGraph-info/kg_metrics.py (StageMetrics / write_run_report),
+# so runs of both builders can be compared side by side.
+# ---------------------------------------------------
+# Latency samples kept per stage (reservoir), enough for stable p99
+MAX_SAMPLES = 10000
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    s = sorted(samples)
+    k = min(len(s) - 1, max(0, int(round(q / 100.0 * (len(s) - 1)))))
+    return s[k]
+
+
+class StageStats:
+    """
+    rows read / filtered / written, transactions, driver retries and
+    transaction latency for one import stage. Printed every `every`
+    seconds and collected into the run report.
+    """
+
+    def __init__(self, stage, every=10.0):
+        self.stage = stage
+        self.every = every
+        self.read = 0
+        self.filtered = 0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.write_s = 0.0
+        self.latencies = []
+        self._n_latencies = 0
+        self.t0 = time.perf_counter()
+        self.t1 = None
+        self._last = self.t0
+
+    def elapsed(self):
+        return (self.t1 or time.perf_counter()) - self.t0
+
+    def record(self, latency, rows=1, attempts=1):
+        self.written += rows
+        self.batches += 1
+        self.retries += max(0, attempts - 1)
+        self.write_s += latency
+        self._n_latencies += 1
+        if len(self.latencies) < MAX_SAMPLES:
+            self.latencies.append(latency)
+        else:
+            j = random.randrange(self._n_latencies)
+            if j < MAX_SAMPLES:
+                self.latencies[j] = latency
+
+        now = time.perf_counter()
+        if now - self._last >= self.every:
+            self._last = now
+            print(self._line())
+
+    def summary(self):
+        elapsed = self.elapsed()
+        return {
+            "stage": self.stage,
+            "rows_read": self.read or self.written,
+            "rows_filtered": self.filtered,
+            "rows_written": self.written,
+            "batches": self.batches,  # one transaction per triple in this builder
+            "retries": self.retries,
+            "tx_p50_ms": round(1000 * percentile(self.latencies, 50), 2),
+            "tx_p95_ms": round(1000 * percentile(self.latencies, 95), 2),
+            "tx_p99_ms": round(1000 * percentile(self.latencies, 99), 2),
+            "elapsed_s": round(elapsed, 2),
+            "write_s": round(self.write_s, 2),
+            "parse_s": round(max(0.0, elapsed - self.write_s), 2),
+            "rows_per_s": round(self.written / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    def _line(self):
+        s = self.summary()
+        return (f"   {self.stage}: {s['rows_written']} rows, {s['batches']} batches, "
+                f"{s['rows_per_s']:.0f} rows/sec, tx p50={s['tx_p50_ms']}ms "
+                f"p95={s['tx_p95_ms']}ms, retries={s['retries']}")
+
+    def done(self):
+        self.t1 = time.perf_counter()
+        s = self.summary()
+        print(f"   {self.stage}: done, read={s['rows_read']} filtered={s['rows_filtered']}, "
+              f"{self._line().split(': ', 1)[1]} in {self.elapsed():.1f}s")
+
+
+STAGES = []
+
+
+def new_stage(name):
+    st = StageStats(name)
+    STAGES.append(st)
+    return st
+
+
+def write_report(out_dir=REPORT_DIR):
+    """
+    Writes kg_run_<timestamp>.json and .csv with one entry per stage
+    """
+    if not STAGES:
+        return None
+    os.makedirs(out_dir, exist_ok=True)
+    ts = time.strftime("%Y%m%d_%H%M%S")
+    rows = [st.summary() for st in STAGES]
+
+    json_path = os.path.join(out_dir, f"kg_run_{ts}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"run": ts, "stages": rows}, f, indent=2)
+    with open(os.path.join(out_dir, f"kg_run_{ts}.csv"), "w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=list(rows[0]))
+        w.writeheader()
+        w.writerows(rows)
+
+    print(f"\n📊 Run report saved to {json_path}")
+    return json_path
+
+
 # ---------------------------------------------------
 # Helper: Safe insert triple
 # ---------------------------------------------------
-def insert_triple(h, r, t, source):
+def insert_triple(h, r, t, source, stats=None):
+
+    if stats is not None:
+        stats.read += 1
 
     # Normalization
     triple = clean_triple({"head": h, "relation": r, "tail": t})
     if not triple:
+        if stats is not None:
+            stats.filtered += 1
         return
 
     h = triple["head"]
     r = triple["relation"]
     t = triple["tail"]
 
-    with driver.session() as s:
-        s.run("""
+    attempts = [0]
+
+    def _work(tx):
+        attempts[0] += 1
+        tx.run("""
             MERGE (a:Entity {name:$h})
             MERGE (b:Entity {name:$t})
             MERGE (a)-[rel:REL {type:$r}]->(b)
             SET rel.source = $src
-        """, h=h, t=t, r=r, src=source)
+        """, h=h, t=t, r=r, src=source).consume()
+
+    t0 = time.perf_counter()
+    with driver.session() as s:
+        # execute_write retries transient errors; attempts counts them
+        s.execute_write(_work)
+    if stats is not None:
+        stats.record(time.perf_counter() - t0, attempts=attempts[0])
 
 
 # ---------------------------------------------------
@@ -54,6 +198,7 @@ def import_umls_concepts():
         return
 
     print("\n📌 Importing UMLS Concepts (MRCONSO.RRF) ...")
+    stats = new_stage("UMLS_CONCEPTS")
 
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         for line in tqdm(f, total=None):
@@ -62,7 +207,12 @@ def import_umls_concepts():
             name = parts[14].strip()  # STR field
 
             if name:
-                insert_triple(cui, "has_name", name, "UMLS")
+                insert_triple(cui, "has_name", name, "UMLS", stats)
+            else:
+                stats.read += 1
+                stats.filtered += 1
+
+    stats.done()
 
 
 # ---------------------------------------------------
@@ -76,6 +226,7 @@ def import_umls_relations():
         return
 
     print("\n📌 Importing UMLS Relations (MRREL.RRF)...")
+    stats = new_stage("UMLS_RELATIONS")
 
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         for line in tqdm(f):
@@ -85,7 +236,12 @@ def import_umls_relations():
             cui2 = p[4].strip()
 
             if cui1 and cui2 and rel:
-                insert_triple(cui1, rel, cui2, "UMLS")
+                insert_triple(cui1, rel, cui2, "UMLS", stats)
+            else:
+                stats.read += 1
+                stats.filtered += 1
+
+    stats.done()
 
 
 # ---------------------------------------------------
@@ -99,6 +255,7 @@ def import_semantic_types():
         return
 
     print("\n📌 Importing Semantic Types (MRSTY.RRF)...")
+    stats = new_stage("SEMANTIC_TYPES")
 
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
         for line in tqdm(f):
@@ -107,7 +264,12 @@ def import_semantic_types():
             sty = p[3].strip()  # semantic type code
 
             if cui and sty:
-                insert_triple(cui, "semantic_type", sty, "UMLS")
+                insert_triple(cui, "semantic_type", sty, "UMLS", stats)
+            else:
+                stats.read += 1
+                stats.filtered += 1
+
+    stats.done()
 
 
 # ---------------------------------------------------
@@ -121,15 +283,20 @@ def import_semantic_groups():
         return
 
     print("\n📌 Importing Semantic Groups ...")
+    stats = new_stage("SEMANTIC_GROUPS")
 
     with open(path, "r") as f:
         for line in tqdm(f):
             if "|" not in line:
+                stats.read += 1
+                stats.filtered += 1
                 continue
 
             group, tui, sty = line.strip().split("|")
 
-            insert_triple(tui, "in_semantic_group", group, "SEMANTIC")
+            insert_triple(tui, "in_semantic_group", group, "SEMANTIC", stats)
+
+    stats.done()
 
 
 # ---------------------------------------------------
@@ -143,6 +310,7 @@ def import_snomed_tc():
         return
 
     print("\n📌 Importing SNOMED Transitive Closure ...")
+    stats = new_stage("SNOMED_TC")
 
     with open(path, "r") as f:
         next(f)  # skip header
@@ -150,12 +318,16 @@ def import_snomed_tc():
 
         for row in tqdm(reader):
             if len(row) < 2:
+                stats.read += 1
+                stats.filtered += 1
                 continue
 
             child = row[0].strip()
             parent = row[1].strip()
 
-            insert_triple(child, "is_a", parent, "SNOMED")
+            insert_triple(child, "is_a", parent, "SNOMED", stats)
+
+    stats.done()
 
 
 # ---------------------------------------------------
@@ -165,11 +337,14 @@ def build_full_kg():
 
     print("\n🚀 Starting FULL KNOWLEDGE GRAPH BUILD ...")
 
-    import_umls_concepts()
-    import_umls_relations()
-    import_semantic_types()
-    import_semantic_groups()
-    import_snomed_tc()
+    try:
+        import_umls_concepts()
+        import_umls_relations()
+        import_semantic_types()
+        import_semantic_groups()
+        import_snomed_tc()
+    finally:
+        write_report()
 
     print("\n✅ COMPLETE: UMLS + SNOMED + Semantic Groups graph built!")
 
@@ -0,0 +1,208 @@
+import os
+import re
+import hashlib
+from collections import Counter, deque
+
+EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", "300"))
+# Words of trailing sentences repeated at the start of the next chunk
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "40"))
+# Embedding model window in word pieces ([CLS] and [SEP] included); 0 = no limit
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+
+# Bump when the splitting rules change so manifests re-chunk everything
+CHUNKER_VERSION = "3"
+
+# A sentence ends at . ! or ? (optionally followed by a closing quote or
+# bracket) when whitespace and an upper-case letter, digit or opening
+# quote/bracket follow.
+_BOUNDARY = re.compile(r"[.!?][\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+_ABBREV = {"e.g", "i.e", "dr", "vs", "fig", "al", "approx", "no", "ca", "cf", "resp", "ref", "mg", "mr", "ms"}
+# A "sentence" without any boundary is cut once the buffer gets this long
+MAX_BUFFER_CHARS = 20000
+
+_tokenizer = None
+
+
+# --------------------------------------------------
+# Token counting
+# --------------------------------------------------
+def _get_tokenizer():
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+            _tokenizer = AutoTokenizer.from_pretrained(EMB_MODEL)
+        except Exception:
+            # Offline or transformers missing: fall back to an estimate
+            _tokenizer = False
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """
+    Word pieces of text without special tokens. Without the tokenizer,
+    a conservative estimate for clinical English (long, rare words).
+    """
+    tok = _get_tokenizer()
+    if tok:
+        return len(tok.tokenize(text))
+    return int(len(re.findall(r"\w+|[^\w\s]", text)) * 1.5) + 1
+
+
+# --------------------------------------------------
+# Sentences
+# --------------------------------------------------
+def _split_sentences(buf: str):
+    """
+    Splits buf at sentence boundaries; the last element is the
+    (possibly incomplete) remainder.
+    """
+    out = []
+    start = 0
+    for m in _BOUNDARY.finditer(buf):
+        head = buf[start:m.start()]
+        last_word = head.rsplit(None, 1)[-1].lower() if head.strip() else ""
+        if last_word.rstrip(".") in _ABBREV or len(last_word) == 1:
+            continue
+        out.append(buf[start:m.end()].strip())
+        start = m.end()
+    out.append(buf[start:])
+    return out
+
+
+def iter_sentences(lines):
+    """
+    Sentences from an iterable of lines (e.g. an open file). Blank lines end
+    a paragraph and therefore a sentence. Only the current unfinished
+    sentence is held in memory.
+    """
+    buf = ""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            if buf.strip():
+                yield buf.strip()
+            buf = ""
+            continue
+
+        # A line ending in a hyphen continues the compound on the next line
+        # ("thyroid-\nstimulating"); keep the hyphen, drop only the break
+        if buf.endswith("-") and line[:1].islower():
+            buf = buf + line
+        else:
+            buf = f"{buf} {line}" if buf else line
+
+        parts = _split_sentences(buf)
+        for sent in parts[:-1]:
+            if sent:
+                yield sent
+        buf = parts[-1]
+
+        if len(buf) > MAX_BUFFER_CHARS:
+            yield buf.strip()
+            buf = ""
+
+    if buf.strip():
+        yield buf.strip()
+
+
+# --------------------------------------------------
+# Chunks
+# --------------------------------------------------
+def _pieces(sentence: str, max_words: int, budget: int):
+    """
+    (text, words, tokens) for a sentence, cut into word windows when it
+    alone exceeds the word or token budget
+    """
+    words = sentence.split()
+    tokens = count_tokens(sentence)
+    if len(words) <= max_words and (not budget or tokens <= budget):
+        yield sentence, len(words), tokens
+        return
+
+    per_word = tokens / max(1, len(words))
+    step = max_words
+    if budget:
+        step = max(1, min(step, int(budget / per_word)))
+    for i in range(0, len(words), step):
+        part = " ".join(words[i:i + step])
+        n = count_tokens(part)
+        # Rare-word runs can still overshoot the average; halve until it fits
+        while budget and n > budget and step > 1:
+            step //= 2
+            part = " ".join(words[i:i + step])
+            n = count_tokens(part)
+        yield part, len(part.split()), n
+
+
+def settings(max_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP,
+             max_tokens: int = CHUNK_TOKENS) -> dict:
+    return {"version": CHUNKER_VERSION, "max_words": max_words,
+            "overlap_words": overlap_words, "max_tokens": max_tokens}
+
+
+def iter_chunks(lines, source: str, max_words: int = CHUNK_WORDS,
+                overlap_words: int = CHUNK_OVERLAP, max_tokens: int = CHUNK_TOKENS):
+    """
+    Packs whole sentences into chunks of at most max_words words and
+    max_tokens embedding tokens, repeating up to overlap_words words of
+    trailing sentences in the next chunk. Yields (chunk_id, text) where
+    chunk_id is "<source>::<hash of text>", so a chunk keeps its id when
+    text elsewhere in the document changes.
+    """
+    budget = max_tokens - 2 if max_tokens else 0
+    window = deque()
+    n_words = n_tokens = 0
+    fresh = 0
+    seen = Counter()
+
+    def emit():
+        text = " ".join(p[0] for p in window)
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+        seen[digest] += 1
+        suffix = "" if seen[digest] == 1 else f"-{seen[digest]}"
+        return f"{source}::{digest}{suffix}", text
+
+    def fits(w, t):
+        return n_words + w <= max_words and (not budget or n_tokens + t <= budget)
+
+    for sentence in iter_sentences(lines):
+        for piece in _pieces(sentence, max_words, budget):
+            if window and not fits(piece[1], piece[2]):
+                if fresh:
+                    yield emit()
+                # Keep trailing sentences as overlap, then make room for the piece
+                keep = deque()
+                kept = 0
+                for p in reversed(window):
+                    if kept + p[1] > overlap_words:
+                        break
+                    keep.appendleft(p)
+                    kept += p[1]
+                window = keep
+                n_words = sum(p[1] for p in window)
+                n_tokens = sum(p[2] for p in window)
+                fresh = 0
+                while window and not fits(piece[1], piece[2]):
+                    p = window.popleft()
+                    n_words -= p[1]
+                    n_tokens -= p[2]
+
+            window.append(piece)
+            n_words += piece[1]
+            n_tokens += piece[2]
+            fresh += 1
+
+    if window and fresh:
+        yield emit()
+
+
+def chunk_file(path, source: str = None, **kwargs):
+    """
+    Streams a text file through iter_chunks
+    """
+    source = source or os.path.basename(str(path))
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        yield from iter_chunks(f, source, **kwargs)
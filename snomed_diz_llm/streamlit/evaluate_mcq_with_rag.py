@@ -1,18 +1,22 @@
 import os
 import re
+import asyncio
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
 from llm_df import test_llm_connection
-from rag_faiss import retrieve_with_faiss, build_faiss_index
-from rag_graph import retrieve_with_graph
-from rag_hybrid import retrieve_with_hybrid
+from response_cache import get_response_cache
+from rag_faiss import retrieve_with_faiss, aretrieve_with_faiss, build_faiss_index
+from rag_graph import retrieve_with_graph, aretrieve_with_graph
+from rag_hybrid import retrieve_with_hybrid, aretrieve_with_hybrid
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 QUESTION_FILE = PROJECT_ROOT / "question" / "thyroid_questions.txt"
 OUT_DIR = PROJECT_ROOT / "output" / "results"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
+# Submit the whole question set at once (LLM_ASYNC_CONCURRENCY bounds the calls in flight)
+EVAL_ASYNC = os.getenv("EVAL_ASYNC", "1") != "0"
 
 def load_questions(path: Path):
     if not path.exists():
@@ -50,27 +54,46 @@ def load_questions(path: Path):
 
     return qs
 
-def run(method, questions):
+def score(answers, questions):
+    """
+    answers: (letter, confidence) per question; confidence is None when
+    the endpoint gave no logprobs
+    """
     preds = []
     flags = []
+    confs = []
 
-    for q in questions:
-        if method == "faiss":
-            pred = retrieve_with_faiss(q["q"], q["opts"])
-        elif method == "graph":
-            pred = retrieve_with_graph(q["q"], q["opts"])
-        else:
-            pred = retrieve_with_hybrid(q["q"], q["opts"])
-
+    for (pred, conf), q in zip(answers, questions):
         pred = (pred or "").strip().upper()
         if pred not in ["A", "B", "C", "D"]:
             pred = "A"
 
         preds.append(pred)
         flags.append(pred in q["ans"])
+        confs.append(conf)
 
     acc = round(100.0 * sum(flags) / max(1, len(flags)), 2)
-    return preds, flags, acc
+    return preds, flags, confs, acc
+
+def run(method, questions):
+    raw = []
+    for q in questions:
+        if method == "faiss":
+            raw.append(retrieve_with_faiss(q["q"], q["opts"], with_confidence=True))
+        elif method == "graph":
+            raw.append(retrieve_with_graph(q["q"], q["opts"], with_confidence=True))
+        else:
+            raw.append(retrieve_with_hybrid(q["q"], q["opts"], with_confidence=True))
+    return score(raw, questions)
+
+async def arun(method, questions):
+    retrieve = {
+        "faiss": aretrieve_with_faiss,
+        "graph": aretrieve_with_graph,
+    }.get(method, aretrieve_with_hybrid)
+    # gather keeps question order
+    raw = await asyncio.gather(*(retrieve(q["q"], q["opts"], with_confidence=True) for q in questions))
+    return score(raw, questions)
 
 def run_all():
     if not test_llm_connection():
@@ -82,22 +105,25 @@ def run_all():
         print("No questions loaded. Check formatting.")
         return
 
-    faiss_path = PROJECT_ROOT / "output" / "faiss_index.pkl"
-    if not faiss_path.exists():
-        build_faiss_index()
+    # Incremental: only new or changed chunks in data/ are embedded
+    build_faiss_index()
 
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     methods = ["faiss", "graph", "hybrid"]
     summary = []
 
     for m in methods:
-        preds, flags, acc = run(m, questions)
+        if EVAL_ASYNC:
+            preds, flags, confs, acc = asyncio.run(arun(m, questions))
+        else:
+            preds, flags, confs, acc = run(m, questions)
 
         df = pd.DataFrame({
             "question": [x["q"] for x in questions],
             "pred": preds,
             "correct": [",".join(x["ans"]) for x in questions],
-            "is_correct": flags
+            "is_correct": flags,
+            "confidence": confs
         })
         df.to_csv(OUT_DIR / f"{m}_{ts}.csv", index=False)
         summary.append({"method": m, "accuracy": acc})
@@ -105,5 +131,9 @@ def run_all():
 
     pd.DataFrame(summary).to_csv(OUT_DIR / f"SUMMARY_{ts}.csv", index=False)
 
+    cache = get_response_cache()
+    if cache is not None:
+        print(cache.stats_line())
+
 if __name__ == "__main__":
     run_all()
@@ -0,0 +1,352 @@
+import os
+import sqlite3
+import argparse
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+SQLITE_PATH = Path(os.getenv("GRAPH_SQLITE_PATH", str(PROJECT_ROOT / "output" / "graph.sqlite")))
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# --------------------------------------------------
+# Interface
+# --------------------------------------------------
+class GraphStore(ABC):
+    """
+    Read-side lookups used by the retrievers. Every method returns plain
+    strings / ids so the prompt-building code does not care which backend
+    answered.
+    """
+
+    @abstractmethod
+    def entity_triples(self, term: str, limit: int = 30):
+        """'head rel tail' for entities whose name contains term"""
+        ...
+
+    @abstractmethod
+    def entity_snomed_ids(self, term: str, limit: int = 30):
+        """SNOMED ids reached via Entity-MAPS_TO-Concept-HAS_SNOMED"""
+        ...
+
+    @abstractmethod
+    def entity_snomed_triples(self, term: str, limit: int = 30):
+        """'SNOMED id IS_A parent' using the stored IS_A edges"""
+        ...
+
+    @abstractmethod
+    def chunk_triples(self, chunk_id: str, limit: int = 50):
+        ...
+
+    @abstractmethod
+    def chunk_snomed_ids(self, chunk_id: str, limit: int = 50):
+        ...
+
+    @abstractmethod
+    def chunk_snomed_triples(self, chunk_id: str, limit: int = 50):
+        ...
+
+    @abstractmethod
+    def chunk_edges(self, chunk_ids, limit: int = 40):
+        """(head, rel_type, tail) for every edge leaving a node the chunks mention"""
+        ...
+
+    def close(self):
+        pass
+
+
+# --------------------------------------------------
+# Neo4j (network)
+# --------------------------------------------------
+class Neo4jGraphStore(GraphStore):
+
+    def __init__(self, driver=None):
+        if driver is None:
+            # Imported here so the SQLite backend works without the neo4j package
+            from utils import get_driver
+            driver = get_driver()
+        self.driver = driver
+
+    def _values(self, cypher: str, **params):
+        with self.driver.session() as s:
+            return [r[0] for r in s.run(cypher, **params).values() if r and r[0]]
+
+    def entity_triples(self, term, limit=30):
+        return self._values("""
+            MATCH (e:Entity)
+            WHERE e.name_lc CONTAINS toLower($term)
+            OPTIONAL MATCH (e)-[r:REL]->(t:Entity)
+            RETURN e.name + " " + r.type + " " + t.name AS triple
+            LIMIT $limit
+        """, term=term, limit=limit)
+
+    def entity_snomed_ids(self, term, limit=30):
+        return self._values("""
+            MATCH (e:Entity)
+            WHERE e.name_lc CONTAINS toLower($term)
+            MATCH (e)-[:MAPS_TO]->(:Concept)-[:HAS_SNOMED]->(sn:SNOMED)
+            RETURN DISTINCT sn.id AS sid
+            LIMIT $limit
+        """, term=term, limit=limit)
+
+    def entity_snomed_triples(self, term, limit=30):
+        return self._values("""
+            MATCH (e:Entity)
+            WHERE e.name_lc CONTAINS toLower($term)
+            MATCH (e)-[:MAPS_TO]->(:Concept)-[:HAS_SNOMED]->(sn:SNOMED)
+            OPTIONAL MATCH (sn)-[:IS_A]->(p:SNOMED)
+            RETURN "SNOMED " + sn.id + " IS_A " + coalesce(p.id,"") AS triple
+            LIMIT $limit
+        """, term=term, limit=limit)
+
+    def chunk_triples(self, chunk_id, limit=50):
+        return self._values("""
+            MATCH (c:Chunk {id:$cid})-[:MENTIONS]->(e:Entity)
+            OPTIONAL MATCH (e)-[r:REL]->(t:Entity)
+            RETURN e.name + " " + r.type + " " + t.name AS triple
+            LIMIT $limit
+        """, cid=chunk_id, limit=limit)
+
+    def chunk_snomed_ids(self, chunk_id, limit=50):
+        return self._values("""
+            MATCH (c:Chunk {id:$cid})-[:MENTIONS]->(e:Entity)
+            MATCH (e)-[:MAPS_TO]->(:Concept)-[:HAS_SNOMED]->(sn:SNOMED)
+            RETURN DISTINCT sn.id AS sid
+            LIMIT $limit
+        """, cid=chunk_id, limit=limit)
+
+    def chunk_snomed_triples(self, chunk_id, limit=50):
+        return self._values("""
+            MATCH (c:Chunk {id:$cid})-[:MENTIONS]->(e:Entity)
+            MATCH (e)-[:MAPS_TO]->(:Concept)-[:HAS_SNOMED]->(sn:SNOMED)
+            OPTIONAL MATCH (sn)-[:IS_A]->(p:SNOMED)
+            RETURN "SNOMED " + sn.id + " IS_A " + coalesce(p.id,"") AS triple
+            LIMIT $limit
+        """, cid=chunk_id, limit=limit)
+
+    def chunk_edges(self, chunk_ids, limit=40):
+        with self.driver.session() as s:
+            return [tuple(r) for r in s.run("""
+                UNWIND $ids AS cid
+                MATCH (c:Chunk {id:cid})-[:MENTIONS]->(x)-[r]->(y)
+                RETURN coalesce(x.name,x.cui) AS h, type(r) AS rel, coalesce(y.name,y.cui) AS t
+                LIMIT $limit
+            """, ids=list(chunk_ids), limit=limit).values()]
+
+    def close(self):
+        self.driver.close()
+
+
+# --------------------------------------------------
+# SQLite (embedded, no network)
+# --------------------------------------------------
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entity (name TEXT PRIMARY KEY, name_lc TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS chunk (id TEXT PRIMARY KEY, source TEXT, text TEXT);
+CREATE TABLE IF NOT EXISTS concept (cui TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE IF NOT EXISTS rel (head TEXT NOT NULL, type TEXT NOT NULL, tail TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS mentions (chunk_id TEXT NOT NULL, entity TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS neighbour (head TEXT NOT NULL, type TEXT NOT NULL, tail TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS maps_to (entity TEXT NOT NULL, cui TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS has_snomed (cui TEXT NOT NULL, sid TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS is_a (child TEXT NOT NULL, parent TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS rel_head ON rel(head);
+CREATE INDEX IF NOT EXISTS mentions_chunk ON mentions(chunk_id);
+CREATE INDEX IF NOT EXISTS neighbour_head ON neighbour(head);
+CREATE INDEX IF NOT EXISTS maps_to_entity ON maps_to(entity);
+CREATE INDEX IF NOT EXISTS has_snomed_cui ON has_snomed(cui);
+CREATE INDEX IF NOT EXISTS is_a_child ON is_a(child);
+"""
+
+
+class SQLiteGraphStore(GraphStore):
+    """
+    Embedded copy of the Entity/Chunk/Concept/SNOMED model in one SQLite
+    file, opened read-only. Build it with `python graph_store.py export`.
+    """
+
+    def __init__(self, path: Path = SQLITE_PATH):
+        if not Path(path).exists():
+            raise FileNotFoundError(f"Graph SQLite file not found: {path} (run graph_store.py export)")
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def _values(self, sql: str, *params):
+        with self._lock:
+            return [r[0] for r in self.conn.execute(sql, params).fetchall() if r and r[0]]
+
+    # instr() gives the same case-sensitive substring test as CONTAINS on name_lc
+    def entity_triples(self, term, limit=30):
+        return self._values("""
+            SELECT e.name || ' ' || r.type || ' ' || r.tail
+            FROM entity e LEFT JOIN rel r ON r.head = e.name
+            WHERE instr(e.name_lc, lower(?)) > 0
+            LIMIT ?
+        """, term, limit)
+
+    def entity_snomed_ids(self, term, limit=30):
+        return self._values("""
+            SELECT DISTINCT h.sid
+            FROM entity e
+            JOIN maps_to m ON m.entity = e.name
+            JOIN has_snomed h ON h.cui = m.cui
+            WHERE instr(e.name_lc, lower(?)) > 0
+            LIMIT ?
+        """, term, limit)
+
+    def entity_snomed_triples(self, term, limit=30):
+        return self._values("""
+            SELECT 'SNOMED ' || h.sid || ' IS_A ' || coalesce(i.parent, '')
+            FROM entity e
+            JOIN maps_to m ON m.entity = e.name
+            JOIN has_snomed h ON h.cui = m.cui
+            LEFT JOIN is_a i ON i.child = h.sid
+            WHERE instr(e.name_lc, lower(?)) > 0
+            LIMIT ?
+        """, term, limit)
+
+    def chunk_triples(self, chunk_id, limit=50):
+        return self._values("""
+            SELECT mn.entity || ' ' || r.type || ' ' || r.tail
+            FROM mentions mn LEFT JOIN rel r ON r.head = mn.entity
+            WHERE mn.chunk_id = ?
+            LIMIT ?
+        """, chunk_id, limit)
+
+    def chunk_snomed_ids(self, chunk_id, limit=50):
+        return self._values("""
+            SELECT DISTINCT h.sid
+            FROM mentions mn
+            JOIN maps_to m ON m.entity = mn.entity
+            JOIN has_snomed h ON h.cui = m.cui
+            WHERE mn.chunk_id = ?
+            LIMIT ?
+        """, chunk_id, limit)
+
+    def chunk_snomed_triples(self, chunk_id, limit=50):
+        return self._values("""
+            SELECT 'SNOMED ' || h.sid || ' IS_A ' || coalesce(i.parent, '')
+            FROM mentions mn
+            JOIN maps_to m ON m.entity = mn.entity
+            JOIN has_snomed h ON h.cui = m.cui
+            LEFT JOIN is_a i ON i.child = h.sid
+            WHERE mn.chunk_id = ?
+            LIMIT ?
+        """, chunk_id, limit)
+
+    def chunk_edges(self, chunk_ids, limit=40):
+        ids = list(chunk_ids)
+        if not ids:
+            return []
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            return self.conn.execute(f"""
+                SELECT mn.entity, n.type, n.tail
+                FROM mentions mn JOIN neighbour n ON n.head = mn.entity
+                WHERE mn.chunk_id IN ({marks})
+                LIMIT ?
+            """, (*ids, limit)).fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def get_graph_store() -> GraphStore:
+    """
+    Shared store selected by GRAPH_BACKEND: "neo4j" (default) or "sqlite"
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = os.getenv("GRAPH_BACKEND", "neo4j").lower()
+            if backend == "sqlite":
+                _store = SQLiteGraphStore(SQLITE_PATH)
+            elif backend == "neo4j":
+                _store = Neo4jGraphStore()
+            else:
+                raise RuntimeError(f"Unknown GRAPH_BACKEND: {backend} (use neo4j or sqlite)")
+    return _store
+
+
+# --------------------------------------------------
+# Neo4j -> SQLite export
+# --------------------------------------------------
+# Only the part of the graph the retrievers can reach is copied: all
+# Entity/Chunk data plus the Concepts and SNOMED nodes linked to entities.
+EXPORT_QUERIES = {
+    "entity": ("MATCH (e:Entity) RETURN e.name, coalesce(e.name_lc, toLower(e.name))", 2),
+    "chunk": ("MATCH (c:Chunk) RETURN c.id, c.source, c.text", 3),
+    "rel": ("MATCH (h:Entity)-[r:REL]->(t:Entity) RETURN h.name, r.type, t.name", 3),
+    # Mentioned nodes are keyed by display name: Entity.name, or Concept name/cui
+    "mentions": ("MATCH (c:Chunk)-[:MENTIONS]->(x) RETURN DISTINCT c.id, coalesce(x.name, x.cui)", 2),
+    "neighbour": ("""
+        MATCH (:Chunk)-[:MENTIONS]->(x)-[r]->(y)
+        RETURN DISTINCT coalesce(x.name, x.cui), type(r), coalesce(y.name, y.cui)
+    """, 3),
+    "maps_to": ("MATCH (e:Entity)-[:MAPS_TO]->(c:Concept) RETURN DISTINCT e.name, c.cui", 2),
+    "concept": ("MATCH (:Entity)-[:MAPS_TO]->(c:Concept) RETURN DISTINCT c.cui, c.name", 2),
+    "has_snomed": ("""
+        MATCH (:Entity)-[:MAPS_TO]->(c:Concept)-[:HAS_SNOMED]->(sn:SNOMED)
+        RETURN DISTINCT c.cui, sn.id
+    """, 2),
+    "is_a": ("""
+        MATCH (:Entity)-[:MAPS_TO]->(:Concept)-[:HAS_SNOMED]->(sn:SNOMED)-[:IS_A]->(p:SNOMED)
+        RETURN DISTINCT sn.id, p.id
+    """, 2),
+}
+
+
+def export_to_sqlite(driver, path: Path = SQLITE_PATH, batch_size: int = 5000):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    if tmp.exists():
+        tmp.unlink()
+
+    conn = sqlite3.connect(tmp)
+    conn.executescript(SQLITE_SCHEMA)
+
+    with driver.session() as s:
+        for table, (cypher, n_cols) in EXPORT_QUERIES.items():
+            insert = f"INSERT OR IGNORE INTO {table} VALUES ({','.join('?' * n_cols)})"
+            n = 0
+            batch = []
+            for rec in s.run(cypher):
+                batch.append(tuple(rec.values()))
+                if len(batch) >= batch_size:
+                    conn.executemany(insert, batch)
+                    n += len(batch)
+                    batch = []
+            conn.executemany(insert, batch)
+            n += len(batch)
+            conn.commit()
+            print(f"GRAPH_EXPORT: {table}: {n} rows")
+
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    os.replace(tmp, path)
+    print(f"GRAPH_EXPORT: done -> {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph store utilities")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    e = sub.add_parser("export", help="Copy the retrieval subgraph from Neo4j into SQLite")
+    e.add_argument("--out", type=str, default=str(SQLITE_PATH))
+    args = parser.parse_args()
+
+    from utils import get_driver
+
+    driver = get_driver()
+    try:
+        export_to_sqlite(driver, Path(args.out))
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
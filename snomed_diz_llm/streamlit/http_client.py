@@ -0,0 +1,89 @@
+import os
+import atexit
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class PooledClient:
+    """
+    Process-wide HTTP client for the LLM endpoint. Connections are pooled
+    and kept alive, so repeated calls skip the TCP and TLS handshakes. Uses
+    httpx with HTTP/2 when it is installed (and LLM_HTTP2 is not 0),
+    otherwise a requests.Session. Safe to share between threads.
+    """
+
+    def __init__(self, pool_size: int = 16, connect_timeout: float = 10.0,
+                 read_timeout: float = 180.0, http2: bool = True):
+        self.pool_size = max(1, int(pool_size))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._httpx = self._httpx_client() if http2 else None
+        self._session = None
+        if self._httpx is None:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size,
+                                  pool_block=True, max_retries=0)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+
+    def _httpx_client(self):
+        try:
+            import httpx
+            return httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=self.pool_size,
+                                    max_keepalive_connections=self.pool_size),
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            )
+        except ImportError:
+            # httpx or its h2 extra is missing
+            return None
+
+    @property
+    def transport(self) -> str:
+        return "httpx/h2" if self._httpx is not None else "requests"
+
+    def post_json(self, url: str, payload: dict, headers: dict = None) -> dict:
+        """
+        POSTs payload as JSON and returns the decoded answer; raises on
+        connection errors, timeouts and non-2xx status codes
+        """
+        if self._httpx is not None:
+            r = self._httpx.post(url, json=payload, headers=headers)
+        else:
+            r = self._session.post(url, json=payload, headers=headers,
+                                   timeout=(self.connect_timeout, self.read_timeout))
+        r.raise_for_status()
+        return r.json()
+
+    def close(self):
+        if self._httpx is not None:
+            self._httpx.close()
+        if self._session is not None:
+            self._session.close()
+
+
+def get_client() -> PooledClient:
+    """
+    Shared client, configured from the environment on first use (after
+    the callers have loaded .env)
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PooledClient(
+                    # Keep-alive connections per host; match the threads calling at once
+                    pool_size=int(os.getenv("LLM_POOL_SIZE", "16")),
+                    connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "10")),
+                    read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "180")),
+                    # HTTP/2 needs httpx with the h2 extra: pip install "httpx[http2]"
+                    http2=os.getenv("LLM_HTTP2", "1") != "0",
+                )
+                atexit.register(_client.close)
+    return _client
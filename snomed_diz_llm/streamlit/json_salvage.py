@@ -0,0 +1,204 @@
+import re
+import json
+import threading
+from collections import Counter
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*\n?(.*?)(?:```|$)", re.S)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_TRIPLE_KEYS = ("head", "relation", "tail")
+
+_decoder = json.JSONDecoder()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+# --------------------------------------------------
+# Outcome counters
+# --------------------------------------------------
+def record(outcome: str):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats() -> dict:
+    """
+    Parse outcomes so far: clean (valid JSON as returned), repaired
+    (recovered after stripping or salvaging) and failed (nothing usable)
+    """
+    with _stats_lock:
+        return {k: _stats[k] for k in ("clean", "repaired", "failed")}
+
+
+def stats_line() -> str:
+    s = stats()
+    return f"JSON_PARSE: clean={s['clean']} repaired={s['repaired']} failed={s['failed']}"
+
+
+# --------------------------------------------------
+# Parsing helpers
+# --------------------------------------------------
+def strip_fences(text: str) -> str:
+    """
+    Content of the first markdown code block (also when the closing fence
+    was cut off), else the text itself
+    """
+    m = _FENCE.search(text or "")
+    return m.group(1).strip() if m else (text or "").strip()
+
+
+def _loose_loads(text: str):
+    """
+    json.loads that also accepts trailing commas, and anything json_repair
+    can fix when it is installed. Raises ValueError when nothing works.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text))
+    except ValueError:
+        pass
+    try:
+        from json_repair import repair_json
+    except ImportError:
+        raise ValueError("not JSON")
+    obj = repair_json(text, return_objects=True)
+    if obj in ("", None):
+        raise ValueError("not JSON")
+    return obj
+
+
+def _first_value(text: str, opener: str):
+    """
+    First complete JSON value starting at `opener`, ignoring prose before
+    and after it; None if there is none
+    """
+    start = text.find(opener)
+    while start != -1:
+        try:
+            return _decoder.raw_decode(text, start)[0]
+        except ValueError:
+            start = text.find(opener, start + 1)
+    return None
+
+
+def iter_objects(text: str):
+    """
+    (start, end) of every balanced {...} in text, innermost first.
+    Braces inside strings are ignored and an unterminated object at the end
+    (truncated output) is never reported.
+    """
+    stack = []
+    in_str = False
+    escape = False
+    for i, ch in enumerate(text):
+        if in_str:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch == "{":
+            stack.append(i)
+        elif ch == "}" and stack:
+            yield stack.pop(), i + 1
+
+
+def _is_triple(obj) -> bool:
+    return isinstance(obj, dict) and all(isinstance(obj.get(k), str) for k in _TRIPLE_KEYS)
+
+
+def salvage_triples(text: str):
+    """
+    Every complete {head, relation, tail} object in text, in order, also
+    from truncated or slightly malformed arrays
+    """
+    triples = []
+    for start, end in iter_objects(text):
+        try:
+            obj = _loose_loads(text[start:end])
+        except ValueError:
+            continue
+        if _is_triple(obj):
+            triples.append((start, obj))
+    return [obj for _, obj in sorted(triples, key=lambda t: t[0])]
+
+
+# --------------------------------------------------
+# Extraction answers
+# --------------------------------------------------
+def parse_triples(out: str):
+    """
+    (triples, outcome) for a single-chunk extraction answer. triples is
+    None only when nothing could be recovered (outcome "failed"); an
+    explicit empty list parses as a valid answer.
+    """
+    try:
+        obj = json.loads(out)
+        if isinstance(obj, list):
+            return obj, "clean"
+    except (TypeError, ValueError):
+        pass
+
+    body = strip_fences(out)
+    # The first decodable "[...]" may sit inside a string of a truncated
+    # answer ("tail": "list []"); only a non-empty list of objects counts
+    obj = _first_value(body, "[")
+    if isinstance(obj, list) and obj and all(isinstance(t, dict) for t in obj):
+        return obj, "repaired"
+
+    triples = salvage_triples(body)
+    if triples:
+        return triples, "repaired"
+    if obj == [] and "{" not in body:
+        # An empty answer wrapped in prose or a fence
+        return [], "repaired"
+    return None, "failed"
+
+
+def parse_sections(out: str, labels):
+    """
+    ({label: triples}, outcome) for a packed extraction answer. Sections
+    whose list is complete are kept; a section cut off by truncation is
+    left out so the caller can extract it on its own.
+    """
+    try:
+        obj = json.loads(out)
+        if isinstance(obj, dict):
+            return obj, "clean"
+    except (TypeError, ValueError):
+        pass
+
+    body = strip_fences(out)
+    obj = _first_value(body, "{")
+    if isinstance(obj, dict) and any(label in obj for label in labels):
+        return obj, "repaired"
+
+    found = []
+    for label in labels:
+        m = re.search(r'"%s"\s*:\s*\[' % re.escape(label), body)
+        if m:
+            found.append((m.end() - 1, label))
+    found.sort()
+
+    sections = {}
+    for n, (start, label) in enumerate(found):
+        try:
+            sections[label] = _decoder.raw_decode(body, start)[0]
+            continue
+        except ValueError:
+            pass
+        # A malformed list is usable when the model went on to the next
+        # section; the last one is most likely cut off
+        if n + 1 < len(found):
+            value = salvage_triples(body[start:found[n + 1][0]])
+            if value:
+                sections[label] = value
+
+    if sections:
+        return sections, "repaired"
+    return None, "failed"
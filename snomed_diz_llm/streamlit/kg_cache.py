@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+CACHE_DIR = Path(os.getenv("KG_CACHE_DIR", str(PROJECT_ROOT / "output" / "kg_cache")))
+MAX_BYTES = int(float(os.getenv("KG_CACHE_MAX_MB", "512")) * 1024 * 1024)
+ENABLED = os.getenv("KG_CACHE", "1") != "0"
+
+_cache = None
+
+
+def cache_key(text: str, prompt_version: str, model: str, temperature: float) -> str:
+    raw = json.dumps([prompt_version, model, float(temperature), text], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """
+    Content-addressed store for extract_kg results: one JSON file per key
+    under <dir>/<key[:2]>/<key>.json holding the raw LLM response and the
+    parsed triples. A hit touches the file, and once the directory grows
+    past max_bytes the least recently used entries are removed.
+    """
+
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def entries(self):
+        if not self.root.exists():
+            return []
+        return list(self.root.glob("*/*.json"))
+
+    def size(self) -> int:
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self.entries())
+        return self._size
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, meta: dict, raw: str, triples):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = dict(meta, key=key, created=time.time(), raw=raw, triples=triples)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+
+        # Write-then-rename so concurrent extractors never read half a file
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._size = self.size() + len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Oldest access first, down to 90% of the cap
+        target = int(self.max_bytes * 0.9)
+        files = sorted(self.entries(), key=lambda p: p.stat().st_mtime)
+        size = sum(p.stat().st_size for p in files)
+        for p in files:
+            if size <= target:
+                break
+            size -= p.stat().st_size
+            p.unlink(missing_ok=True)
+        self._size = size
+
+    def purge(self, model: str = None, older_than_days: float = None) -> int:
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        removed = 0
+        for p in self.entries():
+            if model or cutoff is not None:
+                try:
+                    with open(p, "r", encoding="utf-8") as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    entry = {}
+                if model and entry.get("model") != model:
+                    continue
+                if cutoff is not None and entry.get("created", 0) >= cutoff:
+                    continue
+            p.unlink(missing_ok=True)
+            removed += 1
+        with self._lock:
+            self._size = None
+        return removed
+
+
+def get_cache():
+    """
+    Shared extraction cache, or None when KG_CACHE=0
+    """
+    global _cache
+    if not ENABLED:
+        return None
+    if _cache is None:
+        _cache = ExtractionCache()
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or purge the extract_kg cache")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="Entry count and size")
+    ls = sub.add_parser("list", help="Most recently used entries")
+    ls.add_argument("-n", type=int, default=20)
+    show = sub.add_parser("show", help="Print one entry (key or key prefix)")
+    show.add_argument("key")
+    purge = sub.add_parser("purge", help="Delete entries (all by default)")
+    purge.add_argument("--model", type=str, default=None)
+    purge.add_argument("--older-than", type=float, default=None, metavar="DAYS")
+    args = parser.parse_args()
+
+    cache = ExtractionCache()
+
+    if args.cmd == "stats":
+        n = len(cache.entries())
+        print(f"{cache.root}: {n} entries, {cache.size() / 1e6:.1f} MB (cap {cache.max_bytes / 1e6:.0f} MB)")
+
+    elif args.cmd == "list":
+        files = sorted(cache.entries(), key=lambda p: p.stat().st_mtime, reverse=True)
+        for p in files[:args.n]:
+            with open(p, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(p.stat().st_mtime))
+            print(f"{p.stem[:16]}  {when}  {entry.get('model')}  v{entry.get('prompt_version')}  "
+                  f"{len(entry.get('triples') or [])} triples  {entry.get('preview', '')}")
+
+    elif args.cmd == "show":
+        matches = [p for p in cache.entries() if p.stem.startswith(args.key)]
+        if len(matches) != 1:
+            raise SystemExit(f"{len(matches)} entries match {args.key!r}")
+        with open(matches[0], "r", encoding="utf-8") as f:
+            print(json.dumps(json.load(f), indent=2, ensure_ascii=False))
+
+    else:
+        removed = cache.purge(model=args.model, older_than_days=args.older_than)
+        print(f"Removed {removed} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,217 @@
 import os
+import re
+import math
 import time
 import json
-import requests
+import asyncio
+import weakref
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from pathlib import Path
 from dotenv import load_dotenv
 
+from kg_cache import get_cache, cache_key
+from http_client import get_client
+from response_cache import get_response_cache, response_key
+from json_salvage import parse_triples, parse_sections, record as record_parse
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(PROJECT_ROOT / ".env")
 
 MODEL = os.getenv("DIZ_MODEL")
 API_BASE = (os.getenv("DIZ_API_BASE") or "").rstrip("/") + "/"
 API_KEY = os.getenv("DIZ_API_KEY")
+TEMPERATURE = 0
+
+# Requests per minute allowed by the endpoint (0 = no cap)
+RPM_LIMIT = float(os.getenv("DIZ_RPM", "0"))
+# Extraction requests in flight at once
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "4"))
+# Packed extraction: several chunks per request, sized to the model context
+EXTRACT_PACK = os.getenv("EXTRACT_PACK", "1") != "0"
+EXTRACT_PACK_MAX = int(os.getenv("EXTRACT_PACK_MAX", "8"))
+CONTEXT_TOKENS = int(os.getenv("DIZ_CONTEXT_TOKENS", "8192"))
+# Expected output tokens per input token (triples JSON is roughly as long as its text)
+OUTPUT_RATIO = float(os.getenv("EXTRACT_OUTPUT_RATIO", "1.0"))
+# MCQ answers from one 1-token call with the A-D token distribution (falls
+# back to a full answer when the server returns no logprobs)
+MCQ_LOGPROBS = os.getenv("MCQ_LOGPROBS", "1") != "0"
+MCQ_TOP_LOGPROBS = int(os.getenv("MCQ_TOP_LOGPROBS", "10"))
+# Cap for the fallback answer; the prompts ask for a single letter
+MCQ_MAX_TOKENS = int(os.getenv("MCQ_MAX_TOKENS", "16"))
+# LLM calls in flight at once through the async interface (achat_with_llm, aextract_kg)
+ASYNC_CONCURRENCY = int(os.getenv("LLM_ASYNC_CONCURRENCY", "8"))
+
+
+class RateLimiter:
+    """
+    Spaces requests evenly so that at most `rpm` start per minute, across
+    all threads. Each caller reserves the next free slot and sleeps until it.
+    """
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_limiter = RateLimiter(RPM_LIMIT)
 
 def _post(payload: dict) -> dict:
     if not API_BASE or not API_KEY or not MODEL:
         raise RuntimeError("Missing DIZ_API_BASE / DIZ_API_KEY / DIZ_MODEL in .env")
+    _limiter.wait()
     url = API_BASE + "v1/chat/completions"
     headers = {"Authorization": f"Bearer {API_KEY}"}
-    r = requests.post(url, json=payload, headers=headers, timeout=180)
-    r.raise_for_status()
-    return r.json()
+    return get_client().post_json(url, payload, headers)
 
-def chat_with_llm(prompt: str) -> str:
+def chat_with_llm(prompt: str, use_cache: bool = True, max_tokens: int = None) -> str:
+    """
+    use_cache=False skips the response cache, e.g. when the caller retries
+    because it could not use the previous answer
+    """
     payload = {
         "model": MODEL,
         "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0
+        "temperature": TEMPERATURE
     }
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        key = response_key(API_BASE + "v1/chat/completions", payload)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
 
     for _ in range(3):
         try:
             out = _post(payload)
-            return out["choices"][0]["message"]["content"]
+            content = out["choices"][0]["message"]["content"]
+            if cache is not None:
+                cache.put(key, MODEL, content)
+            return content
         except Exception:
             time.sleep(1)
 
     return "[ERROR] LLM unavailable"
 
+# ---------------- MCQ answers ----------------
+_LETTER_RE = re.compile(r"\b([ABCD])\b")
+# Set to False once the endpoint rejects or ignores logprobs
+_logprobs_supported = None
+
+def _http_status(exc):
+    return getattr(getattr(exc, "response", None), "status_code", None)
+
+def _letter_probs(choice: dict) -> dict:
+    """
+    Normalised probabilities of A-D for the first generated token, from
+    its top_logprobs ("B", " B", "B)" all count as B)
+    """
+    content = (choice.get("logprobs") or {}).get("content") or []
+    if not content:
+        return {}
+    first = content[0]
+    top = first.get("top_logprobs") or [first]
+    probs = {}
+    for t in top:
+        tok = (t.get("token") or "").strip().strip("().:").upper()
+        if tok in ("A", "B", "C", "D") and t.get("logprob") is not None:
+            probs[tok] = probs.get(tok, 0.0) + math.exp(t["logprob"])
+    total = sum(probs.values())
+    return {k: v / total for k, v in probs.items()} if total else {}
+
+def _mcq_logprobs(prompt: str, use_cache: bool):
+    global _logprobs_supported
+    payload = {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": TEMPERATURE,
+        "max_tokens": 1,
+        "logprobs": True,
+        "top_logprobs": MCQ_TOP_LOGPROBS,
+    }
+
+    cache = get_response_cache() if use_cache else None
+    if cache is not None:
+        key = response_key(API_BASE + "v1/chat/completions", payload)
+        hit = cache.get(key)
+        if hit is not None:
+            return json.loads(hit)
+
+    # Only 400/422 mean no logprobs support; 429, 5xx and timeouts are
+    # retried like chat_with_llm before falling back to a text answer
+    out = None
+    for _ in range(3):
+        try:
+            out = _post(payload)
+            break
+        except Exception as exc:
+            if _http_status(exc) in (400, 422):
+                _logprobs_supported = False
+                print("MCQ: endpoint rejects logprobs, parsing full answers instead")
+                return None
+            time.sleep(1)
+    if out is None:
+        return None
+
+    choice = out["choices"][0]
+    if choice.get("logprobs") is None:
+        _logprobs_supported = False
+        print("MCQ: endpoint returns no logprobs, parsing full answers instead")
+        return None
+    _logprobs_supported = True
+
+    probs = _letter_probs(choice)
+    if not probs:
+        # The first token was not a letter (e.g. a preamble)
+        return None
+    letter = max(probs, key=probs.get)
+    ans = {"letter": letter, "probs": probs, "confidence": probs[letter], "mode": "logprobs"}
+    if cache is not None:
+        cache.put(key, MODEL, json.dumps(ans))
+    return ans
+
+def answer_mcq(prompt: str, use_cache: bool = True) -> dict:
+    """
+    {"letter", "probs", "confidence", "mode"} for a prompt that asks for one
+    letter. With logprobs one 1-token call gives the distribution over A-D
+    (confidence = probability of the chosen letter); otherwise the full
+    answer is parsed and probs/confidence stay empty.
+    """
+    if MCQ_LOGPROBS and _logprobs_supported is not False:
+        ans = _mcq_logprobs(prompt, use_cache)
+        if ans is not None:
+            return ans
+
+    text = chat_with_llm(prompt, use_cache=use_cache, max_tokens=MCQ_MAX_TOKENS).strip().upper()
+    m = _LETTER_RE.search(text)
+    return {"letter": m.group(1) if m else "", "probs": {}, "confidence": None, "mode": "text"}
+
 def test_llm_connection() -> bool:
     try:
-        out = chat_with_llm("Return YES if you can read this.")
+        out = chat_with_llm("Return YES if you can read this.", use_cache=False)
         return "YES" in (out or "").upper()
     except Exception:
         return False
 
-def extract_kg(text_chunk: str):
-    prompt = f"""
+# Bump when EXTRACT_PROMPT changes so cached extractions are not reused
+EXTRACT_PROMPT_VERSION = "1"
+
+EXTRACT_PROMPT = """
 You extract clinical knowledge graph triples from guideline text.
 
 Return ONLY valid JSON (no markdown, no comments).
@@ -63,12 +229,190 @@ Return format:
 TEXT:
 {text_chunk}
 """
+
+# Bump when EXTRACT_PACKED_PROMPT changes
+EXTRACT_PACKED_PROMPT_VERSION = "packed-1"
+
+EXTRACT_PACKED_PROMPT = """
+You extract clinical knowledge graph triples from guideline text.
+The text is split into sections, each starting with a line "### <id>".
+
+Return ONLY valid JSON (no markdown, no comments): one object with a key
+for every section id, whose value is the list of triples for that section.
+Each triple must be directly supported by the text of its own section.
+Use an empty list for sections without triples.
+
+Allowed relation examples:
+treated_with, recommended_for, indicated_for, contraindicated_for,
+requires, followed_by, associated_with, risk_factor_for, diagnosed_by.
+
+Return format:
+{{
+  "s1": [{{"head":"...", "relation":"...", "tail":"..."}}],
+  "s2": []
+}}
+
+SECTIONS:
+{sections}
+"""
+
+def estimate_tokens(text: str) -> int:
+    # ~3.5 characters per token for English; errs on the high side
+    return int(len(text) / 3.5) + 1
+
+_PACK_OVERHEAD = estimate_tokens(EXTRACT_PACKED_PROMPT) + 16
+
+def _cached_triples(cache, text: str, version: str):
+    key = cache_key(text, version, MODEL or "", TEMPERATURE)
+    hit = cache.get(key) if cache is not None else None
+    return key, (hit["triples"] if hit is not None else None)
+
+def _cache_put(cache, key: str, text: str, version: str, raw: str, triples):
+    if cache is None:
+        return
+    meta = {
+        "model": MODEL,
+        "prompt_version": version,
+        "temperature": TEMPERATURE,
+        "preview": " ".join(text.split()[:12]),
+    }
+    cache.put(key, meta, raw, triples)
+
+def extract_kg(text_chunk: str):
+    """
+    Triples for one chunk, or None when every attempt failed (endpoint
+    down, nothing parseable), so the caller can retry the chunk later
+    instead of storing it as empty
+    """
+    cache = get_cache()
+    key, hit = _cached_triples(cache, text_chunk, EXTRACT_PROMPT_VERSION)
+    if hit is not None:
+        return hit
+
+    prompt = EXTRACT_PROMPT.format(text_chunk=text_chunk)
+    # Fenced, chatty or truncated answers are salvaged; only an answer
+    # without a single usable triple is asked again. kg_cache keeps the
+    # results, so the response cache is skipped and a retry reaches the model.
     for _ in range(5):
-        out = chat_with_llm(prompt)
-        try:
-            triples = json.loads(out)
-            if isinstance(triples, list):
-                return triples
-        except Exception:
+        out = chat_with_llm(prompt, use_cache=False)
+        triples, outcome = parse_triples(out)
+        record_parse(outcome)
+        if triples is None:
             time.sleep(1)
-    return []
+            continue
+        _cache_put(cache, key, text_chunk, EXTRACT_PROMPT_VERSION, out, triples)
+        return triples
+    return None
+
+def extract_kg_packed(texts):
+    """
+    Extracts triples for several chunks with one request: sections are
+    labelled s1..sN and the model answers with a JSON object keyed by
+    section. Returns one triple list per text, in order. Chunks that are
+    cached are not sent; sections missing from the answer fall back to
+    extract_kg, so an entry is None when that failed too.
+    """
+    cache = get_cache()
+    results = [None] * len(texts)
+    keys = {}
+    for i, text in enumerate(texts):
+        keys[i], results[i] = _cached_triples(cache, text, EXTRACT_PACKED_PROMPT_VERSION)
+        if results[i] is None:
+            # Also reuse results from single-chunk requests
+            results[i] = _cached_triples(cache, text, EXTRACT_PROMPT_VERSION)[1]
+
+    todo = [i for i, r in enumerate(results) if r is None]
+    if len(todo) == 1:
+        results[todo[0]] = extract_kg(texts[todo[0]])
+        return results
+    if not todo:
+        return results
+
+    labels = {f"s{n + 1}": i for n, i in enumerate(todo)}
+    sections = "\n\n".join(f"### {label}\n{texts[i]}" for label, i in labels.items())
+    prompt = EXTRACT_PACKED_PROMPT.format(sections=sections)
+
+    answer = {}
+    for _ in range(3):
+        out = chat_with_llm(prompt, use_cache=False)
+        obj, outcome = parse_sections(out, labels)
+        record_parse(outcome)
+        if obj is None:
+            time.sleep(1)
+            continue
+        answer = obj
+        break
+
+    for label, i in labels.items():
+        triples = answer.get(label)
+        if isinstance(triples, list):
+            _cache_put(cache, keys[i], texts[i], EXTRACT_PACKED_PROMPT_VERSION,
+                       json.dumps(triples, ensure_ascii=False), triples)
+            results[i] = triples
+        else:
+            results[i] = extract_kg(texts[i])
+    return results
+
+def iter_packs(items, context_tokens: int = CONTEXT_TOKENS, max_chunks: int = EXTRACT_PACK_MAX):
+    """
+    Groups consecutive (key, text) items so that instructions, all packed
+    texts and the expected JSON answer fit in the model context
+    """
+    budget = context_tokens - _PACK_OVERHEAD
+    pack = []
+    used = 0
+    for key, text in items:
+        cost = int(estimate_tokens(text) * (1 + OUTPUT_RATIO)) + 8
+        if pack and (used + cost > budget or len(pack) >= max_chunks):
+            yield pack
+            pack = []
+            used = 0
+        pack.append((key, text))
+        used += cost
+    if pack:
+        yield pack
+
+def extract_pack(pack):
+    """
+    Triples for each text of one pack of (key, text) pairs, in pack order
+    (None for a text whose extraction failed)
+    """
+    texts = [text for _, text in pack]
+    if len(texts) == 1:
+        return [extract_kg(texts[0])]
+    return extract_kg_packed(texts)
+
+
+# ---------------- async interface ----------------
+_semaphores = weakref.WeakKeyDictionary()
+_async_pool = None
+
+def _async_slot() -> asyncio.Semaphore:
+    # One semaphore per event loop; asyncio primitives cannot cross loops
+    loop = asyncio.get_running_loop()
+    sem = _semaphores.get(loop)
+    if sem is None:
+        sem = _semaphores[loop] = asyncio.Semaphore(max(1, ASYNC_CONCURRENCY))
+    return sem
+
+async def _bounded(fn, *args):
+    """
+    Runs a blocking LLM call on a worker thread while holding one of
+    ASYNC_CONCURRENCY slots. The call keeps using the pooled client, the
+    rate limiter and the retries of the sync path.
+    """
+    global _async_pool
+    if _async_pool is None:
+        _async_pool = ThreadPoolExecutor(max_workers=max(1, ASYNC_CONCURRENCY),
+                                         thread_name_prefix="llm")
+    async with _async_slot():
+        return await asyncio.get_running_loop().run_in_executor(_async_pool, fn, *args)
+
+async def achat_with_llm(prompt: str, use_cache: bool = True) -> str:
+    return await _bounded(chat_with_llm, prompt, use_cache)
+
+async def aanswer_mcq(prompt: str, use_cache: bool = True) -> dict:
+    return await _bounded(answer_mcq, prompt, use_cache)
+
+async def aextract_kg(text_chunk: str):
+    return await _bounded(extract_kg, text_chunk)
@@ -1,15 +1,20 @@
 import os
+import time
 import argparse
+import threading
+from collections import Counter
 from pathlib import Path
 
-from llm_df import extract_kg
+from llm_df import extract_pack, iter_packs, EXTRACT_CONCURRENCY, EXTRACT_PACK
+from json_salvage import stats_line
+from manifest import Manifest
+from pipeline import Pipeline, Stage
 from utils import (
     get_driver,
     ensure_domain_schema,
-    chunk_text,
     clean_triple,
-    upsert_chunk,
-    insert_triples_safe,
+    write_chunk_triples,
+    delete_chunks,
 )
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -17,6 +22,18 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--input_folder", type=str, default=str(PROJECT_ROOT / "data"))
+    parser.add_argument("--concurrency", type=int, default=EXTRACT_CONCURRENCY,
+                        help="LLM extraction requests in flight (requests/min cap: DIZ_RPM)")
+    parser.add_argument("--no-pack", dest="pack", action="store_false", default=EXTRACT_PACK,
+                        help="One chunk per extraction request instead of packed requests")
+    parser.add_argument("--clean-workers", type=int, default=int(os.getenv("CLEAN_WORKERS", "1")),
+                        help="Threads cleaning extracted triples")
+    # One writer by default: concurrent transactions MERGE the same Entity
+    # nodes and wait on each other's locks
+    parser.add_argument("--write-workers", type=int, default=int(os.getenv("WRITE_WORKERS", "1")),
+                        help="Threads writing to Neo4j (one transaction per batch)")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the manifest and ingest every chunk again")
     args = parser.parse_args()
 
     input_folder = Path(args.input_folder)
@@ -27,32 +44,83 @@ def main():
     ensure_domain_schema(driver)
 
     chunk_words = int(os.getenv("CHUNK_WORDS", "300"))
+    # Chunks written per transaction
+    write_group = max(1, int(os.getenv("WRITE_GROUP_CHUNKS", "8")))
 
-    for file_path in sorted(input_folder.glob("*.txt")):
-        filename = file_path.name
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
+    manifest = Manifest("graph", chunk_words)
+    if args.full:
+        manifest.reset()
+    plan = manifest.plan(input_folder)
+    print(f"Chunks: {plan.summary()}")
 
-        chunks = chunk_text(text, max_words=chunk_words)
+    stale = plan.stale()
+    if stale:
+        delete_chunks(driver, stale)
+    # Files with nothing left to ingest are up to date once stale chunks are gone
+    pending_files = plan.pending_files()
+    manifest.record(plan, [f for f in plan.files if f not in pending_files])
 
-        for i, ch in enumerate(chunks):
-            chunk_id = f"{filename}::chunk_{i:04d}"
-            upsert_chunk(driver, chunk_id, ch, filename)
+    # Chunks left per file; a file is recorded once its last chunk is written
+    remaining = Counter(fname for fname, _ in plan.todo)
+    # Files with a chunk whose extraction failed stay out of the manifest,
+    # so the next run extracts them again
+    failed = Counter()
+    lock = threading.Lock()
 
-            triples_raw = extract_kg(ch)
-            if not triples_raw:
-                continue
+    def extract(pack):
+        triples = extract_pack(pack)
+        return [(fname, cid, text, t) for ((fname, cid), text), t in zip(pack, triples)]
 
-            cleaned = []
-            for t in triples_raw:
-                ct = clean_triple(t)
-                if ct:
-                    cleaned.append(ct)
+    def clean(item):
+        fname, cid, text, triples_raw = item
+        if triples_raw is None:
+            return [(fname, None)]
+        cleaned = []
+        for t in triples_raw:
+            ct = clean_triple(t)
+            if ct:
+                cleaned.append(ct)
+        return [(fname, {"id": cid, "text": text, "triples": cleaned})]
 
-            if cleaned:
-                insert_triples_safe(driver, cleaned, filename, chunk_id=chunk_id)
+    def write(batch):
+        by_file = {}
+        for fname, item in batch:
+            by_file.setdefault(fname, []).append(item)
+        for fname, items in by_file.items():
+            ok = [item for item in items if item is not None]
+            if ok:
+                write_chunk_triples(driver, ok, fname)
+            with lock:
+                failed[fname] += len(items) - len(ok)
+                remaining[fname] -= len(items)
+                if remaining[fname] == 0:
+                    if failed[fname]:
+                        print(f"Extraction failed for {failed[fname]} chunks of {fname}; "
+                              f"not recorded, the next run retries it")
+                    else:
+                        manifest.record(plan, [fname])
+                        print(f"Ingested file: {fname}")
+        return []
 
-    driver.close()
+    todo = (((fname, cid), text) for fname, cid, text in plan.iter_todo())
+    packs = iter_packs(todo) if args.pack else ([item] for item in todo)
+    pipeline = Pipeline([
+        Stage("extract", extract, workers=args.concurrency),
+        Stage("clean", clean, workers=args.clean_workers),
+        Stage("write", write, workers=args.write_workers, batch_size=write_group),
+    ])
+
+    t0 = time.perf_counter()
+    try:
+        pipeline.run(packs)
+    finally:
+        driver.close()
+
+    elapsed = time.perf_counter() - t0
+    n_chunks = pipeline.stages[-1].items_in
+    print(f"Ingested {n_chunks - sum(failed.values())} chunks in {elapsed:.1f}s "
+          f"(concurrency={args.concurrency}, failed={sum(failed.values())})")
+    print(stats_line())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,179 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+
+import chunker
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+MANIFEST_DIR = Path(os.getenv("MANIFEST_DIR", str(PROJECT_ROOT / "output")))
+
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_path(path: Path, fname: str, chunking: dict):
+    return chunker.chunk_file(
+        path, fname, max_words=chunking["max_words"],
+        overlap_words=chunking["overlap_words"], max_tokens=chunking["max_tokens"],
+    )
+
+
+class IngestPlan:
+    """
+    Difference between the manifest and the files on disk, at chunk level.
+    todo holds (filename, chunk_id) for added and changed chunks in file
+    order; iter_todo streams their text again so no chunk text is kept in
+    memory between planning and ingestion. Chunk ids are content hashes, so a changed chunk is a new
+    id at the position of a vanished one; replaced holds those old ids.
+    Replaced and deleted chunks must be removed from the target before
+    todo is ingested.
+    """
+
+    def __init__(self, data_dir: Path = None, chunking: dict = None):
+        self.data_dir = data_dir
+        self.chunking = chunking or {}
+        self.added = []
+        self.changed = []
+        self.replaced = []
+        self.unchanged = []
+        self.deleted = []
+        self.todo = []
+        self.files = {}
+        self.removed_files = []
+
+    def stale(self):
+        return self.replaced + self.deleted
+
+    def pending_files(self):
+        return {fname for fname, _ in self.todo}
+
+    def iter_todo(self):
+        """
+        (filename, chunk_id, text) for every chunk in todo, in order
+        """
+        wanted = {}
+        for fname, cid in self.todo:
+            wanted.setdefault(fname, set()).add(cid)
+        for fname, ids in wanted.items():
+            for cid, text in chunk_path(Path(self.data_dir) / fname, fname, self.chunking):
+                if cid in ids:
+                    yield fname, cid, text
+
+    def summary(self) -> str:
+        return (f"added={len(self.added)} changed={len(self.changed)} "
+                f"unchanged={len(self.unchanged)} deleted={len(self.deleted)}")
+
+
+class Manifest:
+    """
+    File and chunk hashes of what has been ingested into one target
+    (graph or FAISS), stored as JSON. A file whose hash matches is skipped
+    without re-chunking; otherwise its chunks are compared one by one.
+    Changing any chunker setting, or reset(), invalidates everything: all
+    chunks are ingested again and every previously recorded chunk id is
+    planned as deleted, so the target does not keep orphaned chunks.
+    """
+
+    def __init__(self, name: str, chunk_words: int, path: Path = None):
+        self.path = Path(path or MANIFEST_DIR / f"manifest_{name}.json")
+        self.chunk_words = chunk_words
+        self.chunking = chunker.settings(max_words=chunk_words)
+        self.files = {}
+        # Files recorded under other chunker settings (or before reset)
+        self.discarded = {}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("chunking") == self.chunking:
+                self.files = data.get("files", {})
+            else:
+                self.discarded = data.get("files", {})
+
+    def is_empty(self) -> bool:
+        return not self.files
+
+    def plan(self, data_dir: Path) -> IngestPlan:
+        plan = IngestPlan(data_dir, self.chunking)
+        seen = set()
+
+        for file_path in sorted(Path(data_dir).glob("*.txt")):
+            fname = file_path.name
+            seen.add(fname)
+            file_hash = file_sha256(file_path)
+            old = self.files.get(fname)
+
+            if old and old["sha256"] == file_hash:
+                plan.unchanged.extend(old["chunks"])
+                plan.files[fname] = old
+                continue
+
+            old_chunks = old["chunks"] if old else {}
+            new_chunks = {}
+            fresh = []
+            for i, (cid, ch) in enumerate(chunk_path(file_path, fname, self.chunking)):
+                new_chunks[cid] = chunk_hash(ch)
+                if cid in old_chunks:
+                    plan.unchanged.append(cid)
+                else:
+                    fresh.append((i, cid))
+
+            # Old chunks that vanished, by position: a new chunk in the same slot counts as changed
+            gone = {i: cid for i, cid in enumerate(old_chunks) if cid not in new_chunks}
+            for i, cid in fresh:
+                if i in gone:
+                    plan.changed.append(cid)
+                    plan.replaced.append(gone.pop(i))
+                else:
+                    plan.added.append(cid)
+                plan.todo.append((fname, cid))
+
+            plan.deleted.extend(gone.values())
+            plan.files[fname] = {"sha256": file_hash, "chunks": new_chunks}
+
+        for fname, old in self.files.items():
+            if fname not in seen:
+                plan.removed_files.append(fname)
+                plan.deleted.extend(old["chunks"])
+        for old in self.discarded.values():
+            plan.deleted.extend(old["chunks"])
+
+        return plan
+
+    def record(self, plan: IngestPlan, fnames=None):
+        """
+        Marks files from the plan as ingested (all of them by default) and
+        drops removed files, then saves.
+        """
+        for fname in (plan.files if fnames is None else fnames):
+            self.files[fname] = plan.files[fname]
+        for fname in plan.removed_files:
+            self.files.pop(fname, None)
+        # Their chunks were removed from the target before the first record
+        self.discarded = {}
+        self.save()
+
+    def reset(self):
+        """
+        Forgets what was ingested; the old chunk ids are still planned as
+        deleted. The file on disk is only replaced by the next record(), so
+        an interrupted run does not lose them.
+        """
+        self.discarded.update(self.files)
+        self.files = {}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"chunking": self.chunking, "files": self.files}, f, indent=1)
+        os.replace(tmp, self.path)
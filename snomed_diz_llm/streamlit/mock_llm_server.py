@@ -0,0 +1,302 @@
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RELATIONS = [
+    "treated_with", "recommended_for", "indicated_for", "contraindicated_for",
+    "requires", "followed_by", "associated_with", "risk_factor_for", "diagnosed_by",
+]
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "which", "are", "was", "were",
+    "have", "has", "been", "should", "would", "could", "their", "there", "these", "those",
+    "into", "than", "then", "when", "where", "what", "while", "only", "also", "other",
+    "after", "before", "about", "between", "patients", "patient",
+}
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9\-]{3,}")
+_SECTION_RE = re.compile(r"^### (s\d+)\s*$", re.M)
+_OPTION_RE = re.compile(r"^\s*([ABCD])\)\s*(.*)$", re.M)
+
+
+# --------------------------------------------------
+# Latency and failures
+# --------------------------------------------------
+def parse_latency(spec: str):
+    """
+    Returns a sampler for "fixed:S", "uniform:LO,HI", "normal:MEAN,SD",
+    "lognormal:MEDIAN,SIGMA" or "exp:MEAN" (seconds)
+    """
+    kind, _, args = spec.partition(":")
+    vals = [float(v) for v in args.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: vals[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(vals[0], vals[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(vals[0], vals[1]))
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(vals[0]), vals[1])
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1.0 / vals[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+# --------------------------------------------------
+# Heuristic answers
+# --------------------------------------------------
+def _stable(text: str) -> int:
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _terms(text: str, limit: int = 12):
+    out = []
+    for w in _WORD_RE.findall(text):
+        if w.lower() not in STOPWORDS and w not in out:
+            out.append(w)
+        if len(out) >= limit:
+            break
+    return out
+
+
+def fake_triples(text: str, limit: int = 6):
+    """
+    Deterministic triples linking consecutive content words of the text
+    """
+    terms = _terms(text, limit + 1)
+    return [
+        {"head": h, "relation": RELATIONS[_stable(h + t) % len(RELATIONS)], "tail": t}
+        for h, t in zip(terms, terms[1:])
+    ]
+
+
+def option_scores(prompt: str) -> dict:
+    """
+    Overlap between each option's words and the rest of the prompt (the
+    evidence), so answers depend on what retrieval put into the prompt
+    """
+    opts = {m.group(1): m.group(2) for m in _OPTION_RE.finditer(prompt)}
+    context = set(w.lower() for w in _WORD_RE.findall(_OPTION_RE.sub("", prompt)))
+    scores = {}
+    for letter in "ABCD":
+        words = [w.lower() for w in _WORD_RE.findall(opts.get(letter, ""))]
+        hits = sum(1 for w in words if w in context)
+        # Tie-break deterministically per prompt
+        scores[letter] = hits + (_stable(prompt + letter) % 100) / 1000.0
+    return scores
+
+
+def answer(prompt: str, body: dict, scripts):
+    """
+    (content, letter scores or None) for a chat request
+    """
+    for pattern, content in scripts:
+        if pattern.search(prompt):
+            return content, None
+
+    if "knowledge graph triples" in prompt:
+        sections = _SECTION_RE.split(prompt)
+        if len(sections) > 1:
+            # [preamble, s1, text1, s2, text2, ...]
+            labels = sections[1::2]
+            texts = sections[2::2]
+            return json.dumps({lab: fake_triples(txt) for lab, txt in zip(labels, texts)}), None
+        text = prompt.split("TEXT:", 1)[-1]
+        return json.dumps(fake_triples(text)), None
+
+    if "key medical terms" in prompt:
+        question = prompt.split("QUESTION:", 1)[-1]
+        return ", ".join(_terms(question, 6)), None
+
+    if _OPTION_RE.search(prompt):
+        scores = option_scores(prompt)
+        letter = max(scores, key=scores.get)
+        if "final answer" in prompt.lower() and body.get("max_tokens") != 1:
+            return f"FINAL ANSWER: {letter}", scores
+        return letter, scores
+
+    if "Return YES" in prompt:
+        return "YES", None
+    if "final answer" in prompt.lower():
+        return "FINAL ANSWER: A", None
+    return "OK", None
+
+
+def _logprobs(content: str, scores: dict, top: int):
+    if scores:
+        z = sum(math.exp(s) for s in scores.values())
+        alts = sorted(((k, math.log(math.exp(s) / z)) for k, s in scores.items()),
+                      key=lambda kv: -kv[1])
+    else:
+        alts = [(content[:1] or " ", 0.0)]
+    first = {"token": alts[0][0], "logprob": alts[0][1],
+             "top_logprobs": [{"token": t, "logprob": lp} for t, lp in alts[:max(1, top)]]}
+    return {"content": [first]}
+
+
+# --------------------------------------------------
+# Server
+# --------------------------------------------------
+class MockLLM:
+    """
+    Settings and counters shared by all request threads
+    """
+
+    def __init__(self, latency: str = "fixed:0", error_rate: float = 0.0, rate_429: float = 0.0,
+                 retry_after: float = 1.0, seed: int = None, scripts=None, model: str = "mock"):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.scripts = [(re.compile(p, re.I | re.S), c) for p, c in (scripts or [])]
+        self.model = model
+        self.rng = random.Random(seed)
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.t0 = time.perf_counter()
+
+    def draw(self):
+        with self.lock:
+            return self.sample_latency(self.rng), self.rng.random(), self.rng.random()
+
+    def count(self, key: str):
+        with self.lock:
+            self.stats[key] += 1
+
+    def summary(self) -> dict:
+        with self.lock:
+            out = dict(self.stats)
+        out["uptime_s"] = round(time.perf_counter() - self.t0, 1)
+        return out
+
+
+def make_handler(llm: MockLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code: int, obj: dict, headers=None):
+            data = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/stats":
+                self._send(200, llm.summary())
+            else:
+                self._send(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length)
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            try:
+                body = json.loads(raw)
+                prompt = "\n".join(m.get("content") or "" for m in body["messages"])
+            except (ValueError, KeyError, TypeError):
+                llm.count("bad_request")
+                self._send(400, {"error": {"message": "invalid request body"}})
+                return
+
+            llm.count("requests")
+            delay, r_429, r_err = llm.draw()
+            if r_429 < llm.rate_429:
+                llm.count("429")
+                self._send(429, {"error": {"message": "rate limited"}},
+                           {"Retry-After": f"{llm.retry_after:g}"})
+                return
+            time.sleep(delay)
+            if r_err < llm.error_rate:
+                llm.count("500")
+                self._send(500, {"error": {"message": "injected failure"}})
+                return
+
+            content, scores = answer(prompt, body, llm.scripts)
+            if body.get("max_tokens") == 1:
+                content = content[:1] if scores is None else max(scores, key=scores.get)
+            choice = {"index": 0, "message": {"role": "assistant", "content": content},
+                      "finish_reason": "length" if body.get("max_tokens") == 1 else "stop"}
+            if body.get("logprobs"):
+                choice["logprobs"] = _logprobs(content, scores, int(body.get("top_logprobs") or 1))
+
+            llm.count("ok")
+            self._send(200, {
+                "id": f"mock-{_stable(prompt + str(time.time())):x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model") or llm.model,
+                "choices": [choice],
+                "usage": {"prompt_tokens": len(prompt) // 4,
+                          "completion_tokens": max(1, len(content) // 4)},
+            })
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(llm: MockLLM, host: str = "127.0.0.1", port: int = 8808) -> ThreadingHTTPServer:
+    """
+    Starts the server on a background thread and returns it (port=0 picks
+    a free port; see server.server_address)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(llm))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def load_scripts(path: str):
+    """
+    [{"match": regex, "content": reply}, ...] checked in order before the
+    heuristics
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [(r["match"], r["content"]) for r in json.load(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in for the DIZ/SAIA endpoints")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8808)
+    parser.add_argument("--latency", type=str, default="lognormal:0.4,0.5",
+                        help="fixed:S | uniform:LO,HI | normal:MEAN,SD | lognormal:MEDIAN,SIGMA | exp:MEAN")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--script", type=str, default=None, help="JSON file of scripted replies")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    llm = MockLLM(latency=args.latency, error_rate=args.error_rate, rate_429=args.rate_429,
+                  retry_after=args.retry_after, seed=args.seed,
+                  scripts=load_scripts(args.script) if args.script else None)
+    server = serve(llm, args.host, args.port)
+    host, port = server.server_address
+    print(f"MOCK_LLM: listening on http://{host}:{port} (DIZ_API_BASE=http://{host}:{port}, "
+          f"SAIA_API_BASE=http://{host}:{port}/v1)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        print(f"MOCK_LLM: {llm.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import time
+import queue
+import threading
+
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+REPORT_EVERY = float(os.getenv("PIPELINE_REPORT_EVERY", "10"))
+
+_DONE = object()
+
+
+class Stage:
+    """
+    One pipeline step: `workers` threads take items from a bounded inbox,
+    call fn and pass every returned item to the next stage. With
+    batch_size > 1, fn receives a list of up to batch_size items, collected
+    for at most batch_wait seconds. A full inbox blocks the stage before
+    it, which is what keeps memory bounded.
+    """
+
+    def __init__(self, name: str, fn, workers: int = 1, queue_size: int = QUEUE_SIZE,
+                 batch_size: int = 1, batch_wait: float = 1.0):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, int(workers))
+        self.inbox = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = batch_wait
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_s = 0.0
+        self.max_depth = 0
+        self._finished = 0
+        self._lock = threading.Lock()
+
+    def record(self, n_in: int, n_out: int, seconds: float):
+        with self._lock:
+            self.items_in += n_in
+            self.items_out += n_out
+            self.busy_s += seconds
+            self.max_depth = max(self.max_depth, self.inbox.qsize())
+
+    def line(self, elapsed: float) -> str:
+        rate = self.items_in / elapsed if elapsed > 0 else 0.0
+        # Busy share of the available worker time; ~100% marks the bottleneck
+        util = 100.0 * self.busy_s / (elapsed * self.workers) if elapsed > 0 else 0.0
+        return (f"{self.name}[{self.workers}] q={self.inbox.qsize()}/{self.inbox.maxsize} "
+                f"max={self.max_depth} in={self.items_in} {rate:.2f}/s busy={util:.0f}%")
+
+
+class Pipeline:
+    """
+    Runs source -> stage 1 -> ... -> stage N on threads. The source is read
+    on its own thread ("read" in the report). The first worker exception
+    stops all stages and is re-raised by run().
+    """
+
+    def __init__(self, stages, report_every: float = REPORT_EVERY):
+        self.stages = list(stages)
+        self.report_every = report_every
+        self.read = 0
+        self.error = None
+        self._stop = threading.Event()
+        self.t0 = None
+
+    # ---------------- queue helpers ----------------
+    def _put(self, q: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue, wait: float = None):
+        """
+        Blocks until an item arrives (or for at most `wait` seconds, then
+        None). Returns _DONE when the pipeline is stopping.
+        """
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.5 if wait is None else wait)
+            except queue.Empty:
+                if wait is not None:
+                    return None
+        return _DONE
+
+    def _take(self, stage: Stage):
+        """
+        Next item (or batch); _DONE once the stage has been closed
+        """
+        first = self._get(stage.inbox)
+        if first is _DONE or stage.batch_size == 1:
+            return first
+        batch = [first]
+        deadline = time.perf_counter() + stage.batch_wait
+        while len(batch) < stage.batch_size:
+            left = deadline - time.perf_counter()
+            if left <= 0:
+                break
+            item = self._get(stage.inbox, wait=left)
+            if item is None:
+                break
+            if item is _DONE:
+                # Hand the marker back so this worker exits after the batch
+                stage.inbox.put(_DONE)
+                break
+            batch.append(item)
+        return batch
+
+    def _close(self, idx: int):
+        if idx < len(self.stages):
+            nxt = self.stages[idx]
+            for _ in range(nxt.workers):
+                self._put(nxt.inbox, _DONE)
+
+    def _fail(self, exc):
+        if self.error is None:
+            self.error = exc
+        self._stop.set()
+
+    # ---------------- threads ----------------
+    def _feed(self, source):
+        try:
+            for item in source:
+                if not self._put(self.stages[0].inbox, item):
+                    return
+                self.read += 1
+        except Exception as exc:
+            self._fail(exc)
+        self._close(0)
+
+    def _work(self, idx: int):
+        stage = self.stages[idx]
+        out = self.stages[idx + 1].inbox if idx + 1 < len(self.stages) else None
+        try:
+            while True:
+                item = self._take(stage)
+                if item is _DONE:
+                    break
+                t = time.perf_counter()
+                results = list(stage.fn(item) or [])
+                n_in = len(item) if stage.batch_size > 1 else 1
+                stage.record(n_in, len(results), time.perf_counter() - t)
+                if out is not None:
+                    for r in results:
+                        if not self._put(out, r):
+                            return
+        except Exception as exc:
+            self._fail(exc)
+            return
+        finally:
+            with stage._lock:
+                stage._finished += 1
+                last = stage._finished == stage.workers
+        if last:
+            self._close(idx + 1)
+
+    def _report(self):
+        while not self._stop.wait(self.report_every):
+            print(self.status())
+
+    def status(self) -> str:
+        elapsed = time.perf_counter() - self.t0
+        parts = [f"read={self.read}"] + [s.line(elapsed) for s in self.stages]
+        return "PIPELINE: " + " | ".join(parts)
+
+    def run(self, source):
+        self.t0 = time.perf_counter()
+        threads = [threading.Thread(target=self._feed, args=(source,), daemon=True)]
+        for idx, stage in enumerate(self.stages):
+            threads += [threading.Thread(target=self._work, args=(idx,), daemon=True)
+                        for _ in range(stage.workers)]
+        reporter = threading.Thread(target=self._report, daemon=True)
+
+        for t in threads:
+            t.start()
+        reporter.start()
+        for t in threads:
+            t.join()
+        self._stop.set()
+        reporter.join()
+
+        print(self.status())
+        if self.error is not None:
+            raise self.error
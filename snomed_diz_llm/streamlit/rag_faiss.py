@@ -1,18 +1,20 @@
 import os
 import pickle
+import asyncio
 from pathlib import Path
 
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
-from utils import chunk_text
-from llm_df import chat_with_llm
+from llm_df import answer_mcq, aanswer_mcq
+from manifest import Manifest
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DATA_DIR = PROJECT_ROOT / "data"
 OUT_PATH = PROJECT_ROOT / "output" / "faiss_index.pkl"
 
 EMB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBED_BATCH = 256
 
 _emb = None
 _db = None
@@ -23,28 +25,57 @@ def get_emb():
         _emb = HuggingFaceEmbeddings(model_name=EMB_MODEL)
     return _emb
 
-def build_faiss_index():
+def _add_batch(db, batch):
+    texts = [text for _, _, text in batch]
+    metas = [{"chunk_id": cid, "source": fname} for fname, cid, _ in batch]
+    ids = [cid for _, cid, _ in batch]
+    if db is None:
+        return FAISS.from_texts(texts, get_emb(), metadatas=metas, ids=ids)
+    db.add_texts(texts, metadatas=metas, ids=ids)
+    return db
+
+def build_faiss_index(full: bool = False):
+    """
+    Embeds only new or changed chunks (per the FAISS manifest) and removes
+    vectors of changed or deleted ones. Vectors are stored under their
+    chunk_id. A full build runs when forced or when no index exists yet.
+    """
+    global _db
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
 
     chunk_words = int(os.getenv("CHUNK_WORDS", "300"))
 
-    texts = []
-    metas = []
-
-    for file_path in sorted(DATA_DIR.glob("*.txt")):
-        fname = file_path.name
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            chunks = chunk_text(f.read(), max_words=chunk_words)
-
-        for i, ch in enumerate(chunks):
-            chunk_id = f"{fname}::chunk_{i:04d}"
-            texts.append(ch)
-            metas.append({"chunk_id": chunk_id, "source": fname})
-
-    db = FAISS.from_texts(texts, get_emb(), metadatas=metas)
+    manifest = Manifest("faiss", chunk_words)
+    if full or not OUT_PATH.exists():
+        manifest.reset()
+    plan = manifest.plan(DATA_DIR)
+    print(f"FAISS chunks: {plan.summary()}")
+
+    db = None
+    if not manifest.is_empty():
+        with open(OUT_PATH, "rb") as f:
+            db = pickle.load(f)
+        stale = plan.stale()
+        if stale:
+            db.delete(stale)
+
+    # Embedded in batches so chunk texts of large corpora are never all in memory
+    batch = []
+    for item in plan.iter_todo():
+        batch.append(item)
+        if len(batch) >= EMBED_BATCH:
+            db = _add_batch(db, batch)
+            batch = []
+    if batch:
+        db = _add_batch(db, batch)
+
+    if db is None:
+        return
 
     with open(OUT_PATH, "wb") as f:
         pickle.dump(db, f)
+    manifest.record(plan)
+    _db = db
 
 def load_index():
     global _db
@@ -80,7 +111,7 @@ Rules:
 ANSWER:
 """
 
-def retrieve_with_faiss(question, opts):
+def faiss_prompt(question, opts):
     db = load_index()
     k = int(os.getenv("FAISS_K", "8"))
     top = int(os.getenv("HYBRID_TEXT_TOP", "4"))
@@ -88,5 +119,14 @@ def retrieve_with_faiss(question, opts):
     docs = db.as_retriever(search_kwargs={"k": k}).get_relevant_documents(question)
     context = "\n\n---\n\n".join(d.page_content for d in docs[:top])
 
-    prompt = build_prompt(context, question, opts)
-    return chat_with_llm(prompt).strip().upper()
+    return build_prompt(context, question, opts)
+
+def retrieve_with_faiss(question, opts, with_confidence=False):
+    ans = answer_mcq(faiss_prompt(question, opts))
+    return (ans["letter"], ans["confidence"]) if with_confidence else ans["letter"]
+
+async def aretrieve_with_faiss(question, opts, with_confidence=False):
+    # Embedding and index search run on a thread; the answer call is awaited
+    prompt = await asyncio.to_thread(faiss_prompt, question, opts)
+    ans = await aanswer_mcq(prompt)
+    return (ans["letter"], ans["confidence"]) if with_confidence else ans["letter"]
@@ -1,62 +1,46 @@
 import os
-from neo4j import GraphDatabase
+import asyncio
 
-from llm_df import chat_with_llm
+from llm_df import chat_with_llm, achat_with_llm, answer_mcq, aanswer_mcq
+from graph_store import get_graph_store
+from snomed_hierarchy import get_hierarchy
 
-def get_driver():
-    return GraphDatabase.driver(
-        os.getenv("NEO4J_URI"),
-        auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
-    )
-
-def extract_keywords(question: str):
-    prompt = f"""
+def keyword_prompt(question: str) -> str:
+    return f"""
 Extract 5-8 key medical terms from the question.
 Return as a comma-separated list only.
 
 QUESTION:
 {question}
 """
-    out = chat_with_llm(prompt).strip()
-    terms = [t.strip() for t in out.split(",") if t.strip()]
+
+def _parse_keywords(out: str):
+    terms = [t.strip() for t in out.strip().split(",") if t.strip()]
     return terms[:8]
 
-def retrieve_with_graph(question, opts):
-    driver = get_driver()
-    terms = extract_keywords(question)
+def extract_keywords(question: str):
+    return _parse_keywords(chat_with_llm(keyword_prompt(question)))
+
+def graph_prompt(question, opts, terms):
+    store = get_graph_store()
     limit_total = int(os.getenv("GRAPH_TRIPLES_LIMIT", "50"))
+    depth = int(os.getenv("SNOMED_ANCESTOR_DEPTH", "2"))
+    hierarchy = get_hierarchy()
 
     triples = []
 
-    with driver.session() as s:
-        for term in terms:
-            rows = s.run("""
-                MATCH (e:Entity)
-                WHERE e.name_lc CONTAINS toLower($term)
-                OPTIONAL MATCH (e)-[r:REL]->(t:Entity)
-                RETURN e.name + " " + r.type + " " + t.name AS triple
-                LIMIT 30
-            """, term=term).values()
-            for r in rows:
-                if r and r[0]:
-                    triples.append(r[0])
-
-            rows2 = s.run("""
-                MATCH (e:Entity)
-                WHERE e.name_lc CONTAINS toLower($term)
-                MATCH (e)-[:MAPS_TO]->(:Concept)-[:HAS_SNOMED]->(sn:SNOMED)
-                OPTIONAL MATCH (sn)-[:IS_A]->(p:SNOMED)
-                RETURN "SNOMED " + sn.id + " IS_A " + coalesce(p.id,"") AS triple
-                LIMIT 30
-            """, term=term).values()
-            for r in rows2:
-                if r and r[0]:
-                    triples.append(r[0])
-
-            if len(triples) >= limit_total:
-                break
-
-    driver.close()
+    for term in terms:
+        triples.extend(store.entity_triples(term, limit=30))
+
+        if hierarchy is not None:
+            # Ancestors come from the in-process index, bounded and ranked by depth
+            sids = store.entity_snomed_ids(term, limit=30)
+            triples.extend(hierarchy.evidence_lines(sids, max_depth=depth))
+        else:
+            triples.extend(store.entity_snomed_triples(term, limit=30))
+
+        if len(triples) >= limit_total:
+            break
 
     seen = set()
     uniq = []
@@ -67,7 +51,7 @@ def retrieve_with_graph(question, opts):
 
     kg_text = "\n".join(uniq[:limit_total]) if uniq else "No graph evidence found."
 
-    prompt = f"""
+    return f"""
 You are answering a medical multiple-choice exam.
 
 Use ONLY the graph evidence below.
@@ -90,4 +74,14 @@ Rules:
 
 ANSWER:
 """
-    return chat_with_llm(prompt).strip().upper()
+
+def retrieve_with_graph(question, opts, with_confidence=False):
+    ans = answer_mcq(graph_prompt(question, opts, extract_keywords(question)))
+    return (ans["letter"], ans["confidence"]) if with_confidence else ans["letter"]
+
+async def aretrieve_with_graph(question, opts, with_confidence=False):
+    terms = _parse_keywords(await achat_with_llm(keyword_prompt(question)))
+    # Graph lookups are blocking driver/SQLite calls
+    prompt = await asyncio.to_thread(graph_prompt, question, opts, terms)
+    ans = await aanswer_mcq(prompt)
+    return (ans["letter"], ans["confidence"]) if with_confidence else ans["letter"]
@@ -1,46 +1,29 @@
 import os
-from neo4j import GraphDatabase
+import asyncio
 
 from rag_faiss import load_index
-from llm_df import chat_with_llm
-
-def get_driver():
-    return GraphDatabase.driver(
-        os.getenv("NEO4J_URI"),
-        auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
-    )
+from llm_df import answer_mcq, aanswer_mcq
+from graph_store import get_graph_store
+from snomed_hierarchy import get_hierarchy
 
 def graph_evidence_from_chunk_ids(chunk_ids, limit_triples=30):
-    driver = get_driver()
+    store = get_graph_store()
     triples = []
+    depth = int(os.getenv("SNOMED_ANCESTOR_DEPTH", "2"))
+    hierarchy = get_hierarchy()
+
+    for cid in chunk_ids:
+        triples.extend(store.chunk_triples(cid, limit=50))
+
+        if hierarchy is not None:
+            # Ancestors come from the in-process index, bounded and ranked by depth
+            sids = store.chunk_snomed_ids(cid, limit=50)
+            triples.extend(hierarchy.evidence_lines(sids, max_depth=depth))
+        else:
+            triples.extend(store.chunk_snomed_triples(cid, limit=50))
 
-    with driver.session() as s:
-        for cid in chunk_ids:
-            rows = s.run("""
-                MATCH (c:Chunk {id:$cid})-[:MENTIONS]->(e:Entity)
-                OPTIONAL MATCH (e)-[r:REL]->(t:Entity)
-                RETURN e.name + " " + r.type + " " + t.name AS triple
-                LIMIT 50
-            """, cid=cid).values()
-            for r in rows:
-                if r and r[0]:
-                    triples.append(r[0])
-
-            rows2 = s.run("""
-                MATCH (c:Chunk {id:$cid})-[:MENTIONS]->(e:Entity)
-                MATCH (e)-[:MAPS_TO]->(:Concept)-[:HAS_SNOMED]->(sn:SNOMED)
-                OPTIONAL MATCH (sn)-[:IS_A]->(p:SNOMED)
-                RETURN "SNOMED " + sn.id + " IS_A " + coalesce(p.id,"") AS triple
-                LIMIT 50
-            """, cid=cid).values()
-            for r in rows2:
-                if r and r[0]:
-                    triples.append(r[0])
-
-            if len(triples) >= limit_triples:
-                break
-
-    driver.close()
+        if len(triples) >= limit_triples:
+            break
 
     seen = set()
     uniq = []
@@ -51,7 +34,7 @@ def graph_evidence_from_chunk_ids(chunk_ids, limit_triples=30):
 
     return uniq[:limit_triples]
 
-def retrieve_with_hybrid(question, opts):
+def hybrid_prompt(question, opts):
     db = load_index()
 
     k = int(os.getenv("FAISS_K", "8"))
@@ -73,7 +56,7 @@ def retrieve_with_hybrid(question, opts):
     graph_triples = graph_evidence_from_chunk_ids(chunk_ids, limit_triples=graph_top)
     graph_ctx = "\n".join(graph_triples) if graph_triples else "No graph evidence found."
 
-    prompt = f"""
+    return f"""
 You are a senior medical board examiner.
 
 Answer using ONLY the evidence below.
@@ -99,4 +82,13 @@ Rules:
 
 ANSWER:
 """
-    return chat_with_llm(prompt).strip().upper()
+
+def retrieve_with_hybrid(question, opts, with_confidence=False):
+    ans = answer_mcq(hybrid_prompt(question, opts))
+    return (ans["letter"], ans["confidence"]) if with_confidence else ans["letter"]
+
+async def aretrieve_with_hybrid(question, opts, with_confidence=False):
+    # Vector search and graph lookups run on a thread; the answer call is awaited
+    prompt = await asyncio.to_thread(hybrid_prompt, question, opts)
+    ans = await aanswer_mcq(prompt)
+    return (ans["letter"], ans["confidence"]) if with_confidence else ans["letter"]
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+CACHE_PATH = Path(os.getenv("RESPONSE_CACHE_PATH", str(PROJECT_ROOT / "output" / "llm_cache.sqlite")))
+MAX_BYTES = int(float(os.getenv("RESPONSE_CACHE_MAX_MB", "256")) * 1024 * 1024)
+# Entries older than this are treated as missing (0 = never expire)
+TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_DAYS", "30")) * 86400
+ENABLED = os.getenv("RESPONSE_CACHE", "1") != "0"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS response (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS response_accessed ON response(accessed);
+"""
+
+
+def response_key(endpoint: str, payload: dict) -> str:
+    """
+    Hash of everything that determines a chat completion
+    """
+    parts = [
+        endpoint,
+        payload.get("model"),
+        payload.get("messages"),
+        float(payload.get("temperature") or 0),
+        payload.get("max_tokens"),
+    ]
+    if payload.get("logprobs"):
+        # Letter-distribution requests store a different kind of answer
+        parts.append(["logprobs", payload.get("top_logprobs")])
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Chat completion texts in one SQLite file, keyed by response_key.
+    Entries expire after ttl_s seconds; once the stored text exceeds
+    max_bytes the least recently used entries are removed. Shared by all
+    threads of a process (WAL mode lets several processes use the file).
+    """
+
+    def __init__(self, path: Path = CACHE_PATH, max_bytes: int = MAX_BYTES, ttl_s: float = TTL_S):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created FROM response WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl_s and now - row[1] > self.ttl_s):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE response SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, content: str):
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM response WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response(key, model, created, accessed, size, content) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, now, now, size, content),
+            )
+            self._size += size - (old[0] if old else 0)
+            if self.max_bytes and self._size > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+            self._conn.commit()
+
+    def _evict(self, target: int):
+        # Other processes may have written too; start from the real total
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+        rows = self._conn.execute("SELECT key, size FROM response ORDER BY accessed").fetchall()
+        drop = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            drop.append((key,))
+            self._size -= size
+        self._conn.executemany("DELETE FROM response WHERE key = ?", drop)
+
+    def purge(self, expired_only: bool = False) -> int:
+        with self._lock:
+            if expired_only:
+                if not self.ttl_s:
+                    return 0
+                cur = self._conn.execute("DELETE FROM response WHERE created < ?",
+                                         (time.time() - self.ttl_s,))
+            else:
+                cur = self._conn.execute("DELETE FROM response")
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM response").fetchone()[0]
+            return cur.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response").fetchone()[0]
+
+    def stats_line(self) -> str:
+        return (f"RESPONSE_CACHE: hits={self.hits} misses={self.misses} "
+                f"entries={self.count()} size={self._size / 1e6:.1f} MB")
+
+
+def get_response_cache():
+    """
+    Shared response cache, or None when RESPONSE_CACHE=0
+    """
+    global _cache
+    if not ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or purge the LLM response cache")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="Entry count and size")
+    purge = sub.add_parser("purge", help="Delete entries (all by default)")
+    purge.add_argument("--expired", action="store_true", help="Only entries past the TTL")
+    args = parser.parse_args()
+
+    cache = ResponseCache()
+    if args.cmd == "stats":
+        print(f"{cache.path}: {cache.count()} entries, {cache._size / 1e6:.1f} MB "
+              f"(cap {cache.max_bytes / 1e6:.0f} MB, TTL {cache.ttl_s / 86400:g} days)")
+    else:
+        print(f"Removed {cache.purge(expired_only=args.expired)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import os
+import json
+import shutil
+import argparse
+import tempfile
+import threading
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+ISA_FILE = Path(os.getenv(
+    "SNOMED_ISA_FILE",
+    str(PROJECT_ROOT / "KnowledgeGraph-info" / "kb_sources" / "snomed" / "snomed_isa_direct.tsv"),
+))
+INDEX_DIR = Path(os.getenv("SNOMED_INDEX_DIR", str(PROJECT_ROOT / "output" / "snomed_index")))
+
+# ids: sorted SNOMED concept ids (int64); position in ids = internal node id.
+# Parent and child adjacency are CSR pairs: neighbours of node i are
+# indices[indptr[i]:indptr[i + 1]].
+INDEX_FILES = ["ids", "parents_indptr", "parents_indices", "children_indptr", "children_indices"]
+# Size and mtime of the is-a file the index was built from
+SOURCE_FILE = "source.json"
+
+_hierarchy = None
+_hierarchy_lock = threading.Lock()
+
+
+def _csr(src, dst, n):
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32)
+
+
+def _source_stamp(isa_file: Path) -> dict:
+    st = os.stat(isa_file)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def index_is_current(isa_file: Path = ISA_FILE, index_dir: Path = INDEX_DIR) -> bool:
+    """
+    True when the index exists and was built from the is-a file as it is now
+    """
+    try:
+        with open(index_dir / SOURCE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f) == _source_stamp(isa_file)
+    except (OSError, ValueError):
+        return False
+
+
+def build_index(isa_file: Path = ISA_FILE, out_dir: Path = INDEX_DIR):
+    """
+    Converts the direct is-a TSV (child \\t parent) into CSR arrays saved
+    as .npy files, so the hierarchy can be memory-mapped at query time.
+    The files are written to a temp directory that then replaces out_dir,
+    so readers never see a partly written index.
+    """
+    stamp = _source_stamp(isa_file)
+    children, parents = [], []
+    with open(isa_file, "r", encoding="utf-8", errors="ignore") as f:
+        next(f, None)  # header
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 2 or not parts[0].isdigit() or not parts[1].isdigit():
+                continue
+            children.append(int(parts[0]))
+            parents.append(int(parts[1]))
+
+    child = np.asarray(children, dtype=np.int64)
+    parent = np.asarray(parents, dtype=np.int64)
+    ids = np.unique(np.concatenate([child, parent]))
+    c = np.searchsorted(ids, child)
+    p = np.searchsorted(ids, parent)
+
+    arrays = {"ids": ids}
+    arrays["parents_indptr"], arrays["parents_indices"] = _csr(c, p, len(ids))
+    arrays["children_indptr"], arrays["children_indices"] = _csr(p, c, len(ids))
+
+    out_dir = Path(out_dir)
+    out_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{out_dir.name}.", dir=out_dir.parent))
+    try:
+        for name in INDEX_FILES:
+            np.save(tmp / f"{name}.npy", arrays[name])
+        with open(tmp / SOURCE_FILE, "w", encoding="utf-8") as f:
+            json.dump(stamp, f)
+        # A directory cannot replace a non-empty one; move the old index
+        # aside first (open memory maps of it stay valid)
+        old = None
+        if out_dir.exists():
+            old = Path(tempfile.mkdtemp(prefix=f".{out_dir.name}.old.", dir=out_dir.parent))
+            os.replace(out_dir, old / out_dir.name)
+        os.replace(tmp, out_dir)
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"SNOMED index: {len(ids)} concepts, {len(child)} is-a edges -> {out_dir}")
+    return out_dir
+
+
+class SnomedHierarchy:
+    """
+    Direct SNOMED is-a edges as memory-mapped CSR arrays. Ancestors,
+    descendants and subsumption are answered in-process instead of with
+    IS_A hops in Neo4j.
+    """
+
+    def __init__(self, ids, parents_indptr, parents_indices, children_indptr, children_indices):
+        self.ids = ids
+        self._up = (parents_indptr, parents_indices)
+        self._down = (children_indptr, children_indices)
+
+    @classmethod
+    def load(cls, index_dir: Path = INDEX_DIR):
+        arrays = [np.load(index_dir / f"{name}.npy", mmap_mode="r") for name in INDEX_FILES]
+        return cls(*arrays)
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---------------- id mapping ----------------
+    def _node(self, sid):
+        try:
+            key = int(sid)
+        except (TypeError, ValueError):
+            return None
+        i = int(np.searchsorted(self.ids, key))
+        if i < len(self.ids) and self.ids[i] == key:
+            return i
+        return None
+
+    def _sid(self, node: int) -> str:
+        return str(int(self.ids[node]))
+
+    @staticmethod
+    def _neighbours(csr, node: int):
+        indptr, indices = csr
+        return indices[indptr[node]:indptr[node + 1]].tolist()
+
+    def _walk(self, csr, sid, max_depth):
+        start = self._node(sid)
+        if start is None:
+            return []
+        out = []
+        seen = {start}
+        queue = deque((n, 1) for n in self._neighbours(csr, start))
+        while queue:
+            node, depth = queue.popleft()
+            if node in seen or (max_depth is not None and depth > max_depth):
+                continue
+            seen.add(node)
+            out.append((self._sid(node), depth))
+            queue.extend((n, depth + 1) for n in self._neighbours(csr, node))
+        return out
+
+    # ---------------- public API ----------------
+    def parents(self, sid):
+        node = self._node(sid)
+        return [] if node is None else [self._sid(n) for n in self._neighbours(self._up, node)]
+
+    def children(self, sid):
+        node = self._node(sid)
+        return [] if node is None else [self._sid(n) for n in self._neighbours(self._down, node)]
+
+    def ancestors(self, sid, max_depth: int = None):
+        """
+        [(ancestor_id, depth), ...] in breadth-first order, i.e. ranked
+        from the closest ancestor outwards, each at its shortest depth.
+        """
+        return self._walk(self._up, sid, max_depth)
+
+    def descendants(self, sid, max_depth: int = None):
+        return self._walk(self._down, sid, max_depth)
+
+    def is_subsumed(self, a, b) -> bool:
+        """
+        True when a IS_A* b (a concept subsumes itself)
+        """
+        start, target = self._node(a), self._node(b)
+        if start is None or target is None:
+            return False
+        stack = [start]
+        seen = {start}
+        while stack:
+            node = stack.pop()
+            if node == target:
+                return True
+            for n in self._neighbours(self._up, node):
+                if n not in seen:
+                    seen.add(n)
+                    stack.append(n)
+        return False
+
+    def evidence_lines(self, sids, max_depth: int = 2):
+        lines = []
+        for sid in sids:
+            for anc, depth in self.ancestors(sid, max_depth=max_depth):
+                suffix = "" if depth == 1 else f" (depth {depth})"
+                lines.append(f"SNOMED {sid} IS_A {anc}{suffix}")
+        return lines
+
+
+def get_hierarchy():
+    """
+    Shared hierarchy index, or None when neither the index nor the direct
+    is-a file exists (retrievers then fall back to IS_A hops in Cypher).
+    The index is built from the is-a file on first use, and rebuilt when
+    that file has changed since.
+    """
+    global _hierarchy
+    if _hierarchy is None:
+        with _hierarchy_lock:
+            if _hierarchy is None:
+                if ISA_FILE.exists():
+                    if not index_is_current(ISA_FILE, INDEX_DIR):
+                        if (INDEX_DIR / "ids.npy").exists():
+                            print(f"SNOMED index: {ISA_FILE} changed, rebuilding")
+                        build_index(ISA_FILE, INDEX_DIR)
+                elif not (INDEX_DIR / "ids.npy").exists():
+                    return None
+                _hierarchy = SnomedHierarchy.load(INDEX_DIR)
+    return _hierarchy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SNOMED hierarchy index")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="Build the CSR index from the direct is-a file")
+    b.add_argument("--isa-file", type=str, default=str(ISA_FILE))
+    b.add_argument("--out", type=str, default=str(INDEX_DIR))
+
+    q = sub.add_parser("ancestors", help="Print ancestors of a SNOMED concept")
+    q.add_argument("sid")
+    q.add_argument("--depth", type=int, default=None)
+
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build_index(Path(args.isa_file), Path(args.out))
+    else:
+        h = get_hierarchy()
+        if h is None:
+            raise RuntimeError(f"No SNOMED index in {INDEX_DIR} and no is-a file at {ISA_FILE}")
+        for anc, depth in h.ancestors(args.sid, max_depth=args.depth):
+            print(f"{depth}\t{anc}")
+
+
+if __name__ == "__main__":
+    main()
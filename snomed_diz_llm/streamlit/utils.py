@@ -1,10 +1,12 @@
 import os
 import re
-import time
+import threading
 from pathlib import Path
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
 
+from concept_matcher import get_matcher
+
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(PROJECT_ROOT / ".env")
 
@@ -24,11 +26,6 @@ def get_driver():
 # --------------------------------------------------
 # Text utils
 # --------------------------------------------------
-def chunk_text(text: str, max_words: int = 300):
-    words = (text or "").split()
-    return [" ".join(words[i:i + max_words]) for i in range(0, len(words), max_words)]
-
-
 def _clean_space(s: str) -> str:
     s = (s or "").strip()
     s = re.sub(r"\s+", " ", s)
@@ -82,138 +79,201 @@ def ensure_domain_schema(driver):
 
 
 # --------------------------------------------------
-# Upserts
+# Entity -> Concept mapping (FULLTEXT)
 # --------------------------------------------------
-def upsert_chunk(driver, chunk_id: str, text: str, source: str):
-    with driver.session() as s:
-        s.run(
-            """
-            MERGE (c:Chunk {id:$id})
-            ON CREATE SET c.text=$text, c.source=$src
-            ON MATCH  SET c.text=$text
-            """,
-            id=chunk_id,
-            text=text,
-            src=source,
-        )
-
-
-def upsert_entity(driver, name: str, source: str):
-    with driver.session() as s:
-        s.run(
-            """
-            MERGE (e:Entity {name:$name})
-            ON CREATE SET e.name_lc=toLower($name), e.source=$src
-            ON MATCH  SET e.name_lc=toLower($name)
-            """,
-            name=name,
-            src=source,
-        )
-
-
-def link_chunk_mentions(driver, chunk_id: str, entity_name: str):
+# Best concept hit per entity name for the life of the process:
+# name -> (cui, score), or None when nothing matched (negative entry).
+_concept_cache = {}
+_concept_cache_lock = threading.Lock()
+
+CONCEPT_LOOKUP_BATCH = int(os.getenv("CONCEPT_LOOKUP_BATCH", "500"))
+# "dictionary" (in-process matcher), "fulltext" (Neo4j index) or "auto":
+# dictionary when a compiled matcher exists, fulltext otherwise
+CONCEPT_LINKER = os.getenv("CONCEPT_LINKER", "auto").lower()
+
+FULLTEXT_BATCH_CYPHER = """
+    UNWIND $rows AS row
+    CALL {
+        WITH row
+        CALL db.index.fulltext.queryNodes('conceptNameFulltext', row.q)
+        YIELD node, score
+        RETURN node.cui AS cui, score
+        ORDER BY score DESC
+        LIMIT 1
+    }
+    RETURN row.name AS name, cui, score
+"""
+
+MAPS_TO_CYPHER = """
+    UNWIND $rows AS row
+    MATCH (e:Entity {name:row.name})
+    MATCH (c:Concept {cui:row.cui})
+    MERGE (e)-[:MAPS_TO]->(c)
+"""
+
+
+def _concept_matcher():
+    if CONCEPT_LINKER == "fulltext":
+        return None
+    matcher = get_matcher()
+    if matcher is None and CONCEPT_LINKER == "dictionary":
+        raise RuntimeError("CONCEPT_LINKER=dictionary but no matcher built (python concept_matcher.py build)")
+    return matcher
+
+
+def _resolve_concepts_tx(tx, names, min_score: float, batch_size: int = CONCEPT_LOOKUP_BATCH):
+    """
+    name -> cui for names whose best match scores >= min_score. Names not
+    in the cache go to the dictionary matcher, or to the fulltext index
+    batch_size at a time.
+    """
+    with _concept_cache_lock:
+        missing = [n for n in dict.fromkeys(names) if n not in _concept_cache]
+
+    found = {}
+    matcher = _concept_matcher() if missing else None
+    if matcher is not None:
+        for name in missing:
+            hit = matcher.match_entity(name)
+            if hit:
+                found[name] = hit
+    else:
+        rows = []
+        for name in missing:
+            q = sanitize_for_fulltext(name)
+            if q:
+                rows.append({"name": name, "q": q})
+        for i in range(0, len(rows), batch_size):
+            for r in tx.run(FULLTEXT_BATCH_CYPHER, rows=rows[i:i + batch_size]).data():
+                if r.get("cui"):
+                    found[r["name"]] = (r["cui"], float(r.get("score") or 0.0))
+
+    with _concept_cache_lock:
+        for name in missing:
+            _concept_cache[name] = found.get(name)
+        hits = {n: _concept_cache.get(n) for n in names}
+
+    return {n: hit[0] for n, hit in hits.items() if hit and hit[1] >= min_score}
+
+
+def _link_concepts_tx(tx, names, min_score: float) -> int:
+    mapped = _resolve_concepts_tx(tx, names, min_score)
+    if mapped:
+        tx.run(MAPS_TO_CYPHER, rows=[{"name": n, "cui": c} for n, c in mapped.items()])
+    return len(mapped)
+
+
+def map_entities_to_concepts(driver, entity_names, min_score: float = 0.6) -> int:
+    """
+    Maps many Entities to UMLS Concepts: in-process dictionary matches or
+    batched FULLTEXT lookups on conceptNameFulltext (cached per name), and
+    one UNWIND for MAPS_TO.
+    Returns the number of entities mapped.
+    """
     with driver.session() as s:
-        s.run(
-            """
-            MATCH (c:Chunk {id:$cid})
-            MATCH (e:Entity {name:$ename})
-            MERGE (c)-[:MENTIONS]->(e)
-            """,
-            cid=chunk_id,
-            ename=entity_name,
-        )
+        return s.execute_write(_link_concepts_tx, list(entity_names), min_score)
 
 
-# --------------------------------------------------
-# Entity -> Concept mapping (FULLTEXT)
-# --------------------------------------------------
 def map_entity_to_concept_fulltext(driver, entity_name: str, min_score: float = 0.6) -> bool:
     """
-    Maps Entity to UMLS Concept using FULLTEXT index conceptNameFulltext
+    Maps Entity to UMLS Concept using the dictionary matcher or the
+    FULLTEXT index conceptNameFulltext (see CONCEPT_LINKER)
     """
-    safe_q = sanitize_for_fulltext(entity_name)
-    if not safe_q:
-        return False
-
-    with driver.session() as s:
-        rows = s.run(
-            """
-            CALL db.index.fulltext.queryNodes('conceptNameFulltext', $q)
-            YIELD node, score
-            RETURN node.cui AS cui, score
-            ORDER BY score DESC
-            LIMIT 1
-            """,
-            q=safe_q,
-        ).data()
-
-        if not rows:
-            return False
-
-        cui = rows[0].get("cui")
-        score = float(rows[0].get("score") or 0.0)
-
-        if not cui or score < min_score:
-            return False
-
-        s.run(
-            """
-            MATCH (e:Entity {name:$ename})
-            MATCH (c:Concept {cui:$cui})
-            MERGE (e)-[:MAPS_TO]->(c)
-            """,
-            ename=entity_name,
-            cui=cui,
-        )
-        return True
+    return map_entities_to_concepts(driver, [entity_name], min_score=min_score) > 0
 
 
 # --------------------------------------------------
-# Insert triples
+# Insert triples (batched)
 # --------------------------------------------------
-def insert_triples_safe(driver, triples, source: str, chunk_id: str = None):
+CHUNKS_CYPHER = """
+    UNWIND $rows AS row
+    MERGE (c:Chunk {id:row.id})
+    ON CREATE SET c.text=row.text, c.source=$src
+    ON MATCH  SET c.text=row.text
+"""
+
+ENTITIES_CYPHER = """
+    UNWIND $names AS name
+    MERGE (e:Entity {name:name})
+    ON CREATE SET e.name_lc=toLower(name), e.source=$src
+    ON MATCH  SET e.name_lc=toLower(name)
+"""
+
+RELS_CYPHER = """
+    UNWIND $rows AS row
+    MATCH (h:Entity {name:row.head})
+    MATCH (t:Entity {name:row.tail})
+    MERGE (h)-[r:REL {type:row.relation}]->(t)
+    ON CREATE SET r.source=$src
+"""
+
+MENTIONS_CYPHER = """
+    UNWIND $rows AS row
+    MATCH (c:Chunk {id:row.cid})
+    MATCH (e:Entity {name:row.name})
+    MERGE (c)-[:MENTIONS]->(e)
+"""
+
+
+def _write_triples_tx(tx, chunks, entities, rels, mentions, source, min_score):
+    if chunks:
+        tx.run(CHUNKS_CYPHER, rows=chunks, src=source)
+    tx.run(ENTITIES_CYPHER, names=entities, src=source)
+    tx.run(RELS_CYPHER, rows=rels, src=source)
+    if mentions:
+        tx.run(MENTIONS_CYPHER, rows=mentions)
+    _link_concepts_tx(tx, entities, min_score)
+
+
+def write_chunk_triples(driver, items, source: str):
     """
-    Inserts guideline triples and links them to:
-    - Chunk
-    - Concept (via FULLTEXT)
+    Writes a group of chunks and their triples in one managed write
+    transaction: items is [{"id": chunk_id, "text": text or None,
+    "triples": [...]}, ...]. Chunks with text are upserted; entities,
+    REL edges, MENTIONS and MAPS_TO are written with UNWIND. The driver
+    retries the whole transaction on transient errors.
     """
     min_score = float(os.getenv("CONCEPT_FT_MIN_SCORE", "0.6"))
 
-    for t in triples:
-        head = t["head"]
-        rel = t["relation"]
-        tail = t["tail"]
-
-        for attempt in range(3):
-            try:
-                upsert_entity(driver, head, source)
-                upsert_entity(driver, tail, source)
-
-                with driver.session() as s:
-                    s.run(
-                        """
-                        MATCH (h:Entity {name:$h})
-                        MATCH (t:Entity {name:$t})
-                        MERGE (h)-[r:REL {type:$r}]->(t)
-                        ON CREATE SET r.source=$src
-                        """,
-                        h=head,
-                        t=tail,
-                        r=rel,
-                        src=source,
-                    )
-
-                if chunk_id:
-                    link_chunk_mentions(driver, chunk_id, head)
-                    link_chunk_mentions(driver, chunk_id, tail)
-
-                map_entity_to_concept_fulltext(driver, head, min_score=min_score)
-                map_entity_to_concept_fulltext(driver, tail, min_score=min_score)
-
-                break
-
-            except Exception:
-                if attempt == 2:
-                    raise
-                time.sleep(1)
-            
+    chunks = []
+    entities = []
+    seen = set()
+    rels = []
+    mentions = []
+    linked = set()
+    for item in items:
+        cid = item.get("id")
+        if cid and item.get("text") is not None:
+            chunks.append({"id": cid, "text": item["text"]})
+        for t in item.get("triples") or []:
+            rels.append({"head": t["head"], "relation": t["relation"], "tail": t["tail"]})
+            for name in (t["head"], t["tail"]):
+                if name not in seen:
+                    seen.add(name)
+                    entities.append(name)
+                if cid and (cid, name) not in linked:
+                    linked.add((cid, name))
+                    mentions.append({"cid": cid, "name": name})
+
+    if not chunks and not rels:
+        return
+
+    with driver.session() as s:
+        s.execute_write(_write_triples_tx, chunks, entities, rels, mentions, source, min_score)
+
+
+def delete_chunks(driver, chunk_ids, batch_size: int = 1000):
+    """
+    Removes Chunk nodes together with their MENTIONS edges. Entities and
+    REL edges stay, they may be shared with other chunks.
+    """
+    ids = list(chunk_ids)
+    with driver.session() as s:
+        for i in range(0, len(ids), batch_size):
+            s.execute_write(
+                lambda tx, rows: tx.run(
+                    "UNWIND $ids AS cid MATCH (c:Chunk {id:cid}) DETACH DELETE c", ids=rows
+                ).consume(),
+                ids[i:i + batch_size],
+            )
+